@@ -0,0 +1,92 @@
+# PCSO LOTTO DRAW LOADER AND FEATURE ENGINE
+from math import factorial
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+games = [42, 45, 49, 55, 58] # 6/n games, in the column order of oddeven_dist
+cache_file = 'draws_cache.npz'
+
+def game_file(n):
+    return glob.glob('results_6-'+str(n)+'_*.csv')[0]
+
+def parse(filename):
+    # One results CSV -> (uint8[draws, 6] numbers, datetime64[D] dates)
+    data = pd.read_csv(filename, names=['combination', 'date'], delimiter=',', skiprows=1)
+    numbers = data['combination'].str.split('-', expand=True).astype(np.uint8).values
+    dates = pd.to_datetime(data['date'], format='%m/%d/%Y').values.astype('datetime64[D]')
+    return numbers, dates
+
+def load_games():
+    # {n: (numbers, dates)} for every game, parsed once and kept in draws_cache.npz
+    # until one of the results CSVs changes
+    files = [game_file(n) for n in games]
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= max(os.path.getmtime(f) for f in files):
+        cache = np.load(cache_file)
+        return dict((n, (cache['numbers_'+str(n)], cache['dates_'+str(n)])) for n in games)
+    parsed = dict((n, parse(f)) for n, f in zip(games, files))
+    arrays = {}
+    for n in games:
+        arrays['numbers_'+str(n)], arrays['dates_'+str(n)] = parsed[n]
+    np.savez(cache_file, **arrays)
+    return parsed
+
+def features(parsed):
+    # Every statistic for every game from one stacked pass over all the draws.
+    # Balls are indexed 1..n in per-game arrays (index 0 unused)
+    numbers = np.concatenate([parsed[n][0] for n in games])
+    game = np.repeat(np.arange(len(games)), [len(parsed[n][0]) for n in games])
+    top = max(games)+1
+
+    even = (numbers%2 == 0).sum(axis=1) # Even numbers per draw
+    oddeven = np.bincount(game*7+even, minlength=7*len(games)).reshape(len(games), 7)
+    freq = np.bincount((game[:, None]*top+numbers).ravel(), minlength=top*len(games)).reshape(len(games), top)
+    sums = numbers.sum(axis=1, dtype=np.int32)
+
+    F = {}
+    start = 0
+    for g, n in enumerate(games):
+        draws = len(parsed[n][0])
+        X = np.zeros((draws, n+1), dtype=np.int32) # One-hot draws
+        X[np.arange(draws)[:, None], parsed[n][0]] = 1
+
+        # Gaps: draws between consecutive appearances of each ball
+        ball, when = np.nonzero(X.T)
+        gap = np.diff(when)
+        same = np.diff(ball) == 0
+        gaps = np.bincount(ball[1:][same], weights=gap[same], minlength=n+1)
+        count = np.bincount(ball[1:][same], minlength=n+1)
+        last = np.full(n+1, -1)
+        last[ball] = when # nonzero is ordered by draw within a ball, so the last write wins
+
+        F[n] = {
+            'even': even[start:start+draws],
+            'odd': 6-even[start:start+draws],
+            'oddeven': oddeven[g], # Draws with 0..6 even numbers
+            'freq': freq[g, :n+1],
+            'sum': sums[start:start+draws],
+            'gap_mean': np.where(count > 0, gaps/np.maximum(count, 1), np.nan),
+            'gap_current': np.where(last >= 0, draws-1-last, draws), # Draws since each ball last came up
+            'pairs': X.T.dot(X), # pairs[a, b]: draws with both a and b; the diagonal is freq
+        }
+        start += draws
+    return F
+
+def comb(n, k):
+    return factorial(n)/(factorial(k)*factorial(n-k))
+
+def oddeven_tables(F):
+    # oddeven_dist and oddeven_err as the notebook lays them out: rows are
+    # 0-6 .. 6-0 (even-odd); columns 2*g, 2*g+1 are theoretical and empirical
+    # counts (absolute and relative error in err) for game g
+    dist = np.zeros((7, 2*len(games)))
+    for g, n in enumerate(games):
+        i = np.arange(7)
+        prob = np.array([comb(n//2, e)*comb(n-n//2, 6-e) for e in i])/float(comb(n, 6))
+        dist[:, 2*g] = prob*F[n]['oddeven'].sum()
+        dist[:, 2*g+1] = F[n]['oddeven']
+    err = np.zeros_like(dist)
+    err[:, 0::2] = abs(dist[:, 1::2]-dist[:, 0::2])
+    err[:, 1::2] = 100*abs(1-dist[:, 0::2]/dist[:, 1::2])
+    return dist, err
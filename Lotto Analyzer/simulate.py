@@ -0,0 +1,69 @@
+# BATCHED MONTE CARLO LOTTO DRAW SIMULATOR
+import argparse
+import multiprocessing
+import time
+import numpy as np
+
+chunk = 1000000 # Draws per job; fixed so results don't depend on the worker count
+
+def draw_batch(rng, n, k, size):
+    # size draws of k distinct balls out of 1..n. While most k-tuples are
+    # already distinct, draw with repeats and redraw the rows that have any;
+    # otherwise take the k smallest of n uniforms per row
+    if np.prod((n-np.arange(k))/float(n)) < 0.5:
+        return np.argpartition(rng.random_sample((size, n)), k-1, axis=1)[:, :k]+1
+    balls = rng.randint(1, n+1, size=(size, k))
+    redo = np.arange(size)
+    while len(redo) > 0:
+        s = np.sort(balls[redo], axis=1)
+        redo = redo[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+        balls[redo] = rng.randint(1, n+1, size=(len(redo), k))
+    return balls
+
+def count_draws(job):
+    # Per-ball histogram (index 0 unused) of draws draws, batch rows at a time
+    n, k, draws, seed, batch = job
+    rng = np.random.RandomState(seed)
+    hist = np.zeros(n+1, dtype=np.int64)
+    for i in range(0, draws, batch):
+        hist += np.bincount(draw_batch(rng, n, k, min(batch, draws-i)).ravel(), minlength=n+1)
+    return hist
+
+def simulate(n, k, draws, trials=1, seed=None, workers=1, batch=10000):
+    # Float array [n, trials] of how often each ball came up in each trial of
+    # draws draws, as in draw_control.csv / draw_experiment.csv. Trials (and
+    # chunks of long trials) are seeded up front from seed, so a run is
+    # reproducible whatever the number of workers
+    chunks = -(-draws//chunk)
+    seeds = np.random.RandomState(seed).randint(0, 2**31-1, size=(trials, chunks))
+    jobs = [(n, k, min(chunk, draws-c*chunk), int(seeds[t, c]), batch) for t in range(trials) for c in range(chunks)]
+    if workers > 1:
+        pool = multiprocessing.Pool(workers)
+        hists = pool.map(count_draws, jobs)
+        pool.close()
+        pool.join()
+    else:
+        hists = map(count_draws, jobs)
+    hist = np.array(hists).reshape(trials, chunks, n+1).sum(axis=1)
+    return hist[:, 1:].T.astype(float)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate n/k lotto draws")
+    parser.add_argument('--n', type=int, default=45, help="balls")
+    parser.add_argument('--k', type=int, default=6, help="balls per draw")
+    parser.add_argument('--draws', type=int, default=10000, help="draws per trial")
+    parser.add_argument('--trials', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--out', default=None, help="CSV in the draw_control.csv layout")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    hist = simulate(args.n, args.k, args.draws, args.trials, args.seed, args.workers)
+    t = time.time()-t0
+    print "%d draws of %d/%d in %.3f s (%.0f draws/s)" % (args.draws*args.trials, args.k, args.n, t, args.draws*args.trials/t)
+    if args.out is not None:
+        np.savetxt(args.out, hist, delimiter=',')
+
+if __name__ == '__main__':
+    main()
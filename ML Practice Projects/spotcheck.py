@@ -0,0 +1,110 @@
+# Spot-Check Harness: cached standardized folds, parallel model x fold jobs
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+import sklearn
+from sklearn import model_selection
+from sklearn.metrics import mean_squared_error
+from sklearn.preprocessing import StandardScaler
+
+cache_dir = ".spotcheck"
+
+def data_key(X, Y, n_splits, seed):
+    # Identifies a dataset and its fold layout; any change to either gives a new key
+    h = hashlib.sha1()
+    for a in [np.ascontiguousarray(X, dtype=float), np.ascontiguousarray(Y, dtype=float)]:
+        h.update(str(a.shape))
+        h.update(a.tostring())
+    h.update("%d %s" % (n_splits, seed))
+    return h.hexdigest()[:16]
+
+def model_key(model):
+    # Identifies a model: class, parameters and the sklearn version fitting it
+    params = sorted((k, repr(v)) for k, v in model.get_params().items())
+    return hashlib.sha1(repr((type(model).__name__, params, sklearn.__version__))).hexdigest()[:16]
+
+def make_folds(X, Y, n_splits=10, seed=7):
+    # Standardize each training fold (and its validation fold with the same
+    # scaler) once, and keep the folds in .spotcheck/folds_<key>.npz
+    key = data_key(X, Y, n_splits, seed)
+    path = os.path.join(cache_dir, "folds_"+key+".npz")
+    if not os.path.exists(path):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        folds = {}
+        kfold = model_selection.KFold(n_splits=n_splits, random_state=seed)
+        for i, (train, test) in enumerate(kfold.split(X)):
+            scaler = StandardScaler().fit(X[train])
+            folds["X_train_%d" % i] = scaler.transform(X[train])
+            folds["X_test_%d" % i] = scaler.transform(X[test])
+            folds["Y_train_%d" % i] = Y[train]
+            folds["Y_test_%d" % i] = Y[test]
+        np.savez(path+".tmp.npz", **folds)
+        os.rename(path+".tmp.npz", path)
+    return key, path
+
+def run_fold(job):
+    # Fit one model on one cached fold; returns its neg-MSE and timings
+    path, i, model = job
+    folds = np.load(path)
+    t0 = time.time()
+    model.fit(folds["X_train_%d" % i], folds["Y_train_%d" % i])
+    fit_time = time.time()-t0
+    t0 = time.time()
+    pred = model.predict(folds["X_test_%d" % i])
+    predict_time = time.time()-t0
+    return {'score': -mean_squared_error(folds["Y_test_%d" % i], pred), 'fit_time': fit_time, 'predict_time': predict_time}
+
+def spot_check(models, X, Y, n_splits=10, seed=7, workers=None, cutoff=None, min_folds=3):
+    # Cross-validate every (name, model) on the same cached folds over a process
+    # pool. With cutoff, models are compared on their first min_folds folds
+    # and one whose mean MSE there exceeds cutoff times the best model's is
+    # not run on the remaining folds (cut, if any of them were missing). Fold
+    # results are kept in .spotcheck/results_<key>.json and reused until the
+    # model or the data changes. Returns {name: summary} in the models' order
+    key, path = make_folds(X, Y, n_splits, seed)
+    results_path = os.path.join(cache_dir, "results_"+key+".json")
+    cache = json.load(open(results_path)) if os.path.exists(results_path) else {}
+    mkeys = dict((name, model_key(model)) for name, model in models)
+    done = dict((name, cache.get(mkeys[name], {})) for name, model in models) # Fold index (str) -> result
+    cut = set()
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        first = n_splits if cutoff is None else min(min_folds, n_splits)
+        for phase, rounds in enumerate([range(first), range(first, n_splits)]):
+            if phase == 1 and cutoff is not None:
+                mse = dict((name, -np.mean([done[name][str(i)]['score'] for i in range(first)])) for name, model in models)
+                best = min(mse.values())
+                worse = set(name for name in mse if mse[name] > cutoff*best)
+                cut = set(name for name in worse if any(str(i) not in done[name] for i in rounds)) # Jobs actually dropped
+            jobs = [(name, i, (path, i, model)) for name, model in models for i in rounds
+                    if name not in cut and str(i) not in done[name]]
+            for (name, i, job), r in zip(jobs, pool.map(run_fold, [j[2] for j in jobs])):
+                done[name][str(i)] = r
+                cache[mkeys[name]] = done[name]
+    finally:
+        pool.close()
+        pool.join()
+    json.dump(cache, open(results_path, 'w'), indent=1, sort_keys=True)
+
+    summary = {}
+    for name, model in models:
+        folds = [done[name][str(i)] for i in range(n_splits) if str(i) in done[name]]
+        summary[name] = {
+            'scores': np.array([r['score'] for r in folds]),
+            'fit_time': sum(r['fit_time'] for r in folds),
+            'predict_time': sum(r['predict_time'] for r in folds),
+            'cut': name in cut,
+        }
+    return summary
+
+def report(models, summary):
+    # The notebook's "name: mean (std)" lines, with the timings next to them
+    for name, model in models:
+        s = summary[name]
+        print("%s: %f (%f) fit %.3fs predict %.3fs%s" % (name, s['scores'].mean(), s['scores'].std(),
+              s['fit_time'], s['predict_time'], " [cut after %d folds]" % len(s['scores']) if s['cut'] else ""))
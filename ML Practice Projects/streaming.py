@@ -0,0 +1,106 @@
+# Out-of-Core Training: chunked reader, incremental scaler, partial_fit regressors
+import argparse
+import multiprocessing
+import resource
+import time
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, SGDRegressor, PassiveAggressiveRegressor
+from sklearn.preprocessing import StandardScaler
+
+names = ["f-acid", "v-acid", "c-acid", "r-sugar", "chlor", "f-SO2", "t-SO2", "D", "pH", "SO4", "OH", "quality"]
+
+def stream_models(seed=7):
+    # Regressors that can learn batch by batch
+    return [('SGD', SGDRegressor(random_state=seed, tol=None, max_iter=1)),
+            ('SGD-EN', SGDRegressor(penalty='elasticnet', random_state=seed, tol=None, max_iter=1)),
+            ('PA', PassiveAggressiveRegressor(random_state=seed, tol=None, max_iter=1))]
+
+def read_chunks(filename, chunksize=10000, holdout=5):
+    # Yields (X, Y, held) per chunk of the semicolon-delimited file; held marks
+    # every holdout-th row (by position in the file) for evaluation
+    start = 0
+    for chunk in pd.read_csv(filename, names=names, delimiter=';', skiprows=1, chunksize=chunksize, dtype=np.float64):
+        values = chunk.values
+        held = (np.arange(start, start+len(values))%holdout) == 0
+        start += len(values)
+        yield values[:, 0:11], values[:, 11], held
+
+def train_stream(filename, chunksize=10000, epochs=5, holdout=5, seed=7):
+    # One pass to fit the scaler, epochs passes of partial_fit, one pass to
+    # score the held-out rows; memory stays at one chunk plus the models
+    t0 = time.time()
+    rows = 0
+    scaler = StandardScaler()
+    for X, Y, held in read_chunks(filename, chunksize, holdout):
+        scaler.partial_fit(X[~held])
+        rows += len(X)
+
+    models = stream_models(seed)
+    for epoch in range(epochs):
+        for X, Y, held in read_chunks(filename, chunksize, holdout):
+            Xs = scaler.transform(X[~held])
+            for name, model in models:
+                model.partial_fit(Xs, Y[~held])
+
+    sse = dict((name, 0.0) for name, model in models)
+    count = 0
+    for X, Y, held in read_chunks(filename, chunksize, holdout):
+        Xs = scaler.transform(X[held])
+        for name, model in models:
+            sse[name] += ((model.predict(Xs)-Y[held])**2).sum()
+        count += held.sum()
+    t = time.time()-t0
+    return {'path': 'stream', 'rows': rows, 'time': t, 'rows_per_s': rows*(epochs+2)/t,
+            'mse': dict((name, sse[name]/count) for name in sse),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def train_memory(filename, epochs=5, holdout=5, seed=7):
+    # The notebook's way: whole file in memory, same split, same models (plus
+    # LinearRegression, which needs all rows at once)
+    t0 = time.time()
+    data = pd.read_csv(filename, names=names, delimiter=';', skiprows=1).values
+    X, Y = data[:, 0:11], data[:, 11]
+    held = (np.arange(len(X))%holdout) == 0
+    scaler = StandardScaler().fit(X[~held])
+    Xs, Xh = scaler.transform(X[~held]), scaler.transform(X[held])
+    models = [('LR', LinearRegression())]+stream_models(seed)
+    for name, model in models:
+        if name == 'LR':
+            model.fit(Xs, Y[~held])
+        else:
+            for epoch in range(epochs):
+                model.partial_fit(Xs, Y[~held])
+    t = time.time()-t0
+    return {'path': 'memory', 'rows': len(X), 'time': t, 'rows_per_s': len(X)*(epochs+2)/t,
+            'mse': dict((name, float(((model.predict(Xh)-Y[held])**2).mean())) for name, model in models),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def run(args):
+    # Runs in a fresh worker process so peak RSS belongs to this path alone
+    path, filename, chunksize, epochs, holdout = args
+    if path == 'stream':
+        return train_stream(filename, chunksize, epochs, holdout)
+    return train_memory(filename, epochs, holdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train wine-quality regressors out of core")
+    parser.add_argument('files', nargs='*', default=["winequality-red.csv", "winequality-white.csv"])
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--holdout', type=int, default=5, help="every n-th row is held out")
+    parser.add_argument('--no-memory', action='store_true', help="skip the in-memory comparison")
+    args = parser.parse_args()
+
+    for filename in args.files:
+        for path in ['stream'] if args.no_memory else ['stream', 'memory']:
+            pool = multiprocessing.Pool(1)
+            r = pool.apply(run, [(path, filename, args.chunksize, args.epochs, args.holdout)])
+            pool.close()
+            pool.join()
+            print("%s [%s]: %d rows, %.0f rows/s, peak %d KB" % (filename, path, r['rows'], r['rows_per_s'], r['peak_rss_kb']))
+            for name in sorted(r['mse']):
+                print("  %s: held-out MSE %f" % (name, r['mse'][name]))
+
+if __name__ == '__main__':
+    main()
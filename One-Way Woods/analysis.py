@@ -0,0 +1,129 @@
+# REACHABILITY AND SCC ANALYSIS OF THE FULL ONE-WAY WOODS STATE GRAPH
+import numpy as np
+import json
+import os
+import sys
+import time
+from master import Master
+from graph import Graph
+
+class Analysis:
+    def __init__(self, k):
+        self.k = k
+        self.M = Master(k)
+        self.filename = "analysis_oww_"+str(k)+".json"
+        self.pairs_filename = "analysis_oww_"+str(k)+"_pairs.csv"
+
+    def build(self):
+        print "Analyzing", self.k, "digits..."
+        t0 = time.time()
+        G = Graph(self.k, self.M)
+        dist, move, prev = G.bfs_reverse()
+        self.T = G.table
+        self.nodes = np.flatnonzero(self.M.valid(np.arange(self.M.size)))
+
+        # Positions that can never reach the goal
+        self.unsolvable = self.M.unrank(self.nodes[dist[self.nodes] < 0])
+
+        self.comp = self.scc()
+        sizes = np.bincount(self.comp[self.nodes])
+        sizes = sizes[sizes > 0]
+        self.scc_sizes = dict((int(s), int(c)) for s, c in zip(*np.unique(sizes, return_counts=True)))
+        self.goal_scc = int(sizes[self.comp[self.M.rank([self.M.goal])[0]]])
+
+        self.pairs = self.two_way()
+        print "Done! Time taken to analyze:", time.time()-t0, "s"
+
+    def scc(self):
+        # Iterative Tarjan over the successor table; returns a component id per dense index
+        succ = [self.T[d].tolist() for d in range(5)]
+        index = [-1]*self.M.size
+        low = [0]*self.M.size
+        onstack = bytearray(self.M.size)
+        comp = [-1]*self.M.size
+        stack = []
+        counter, count = 0, 0
+        for root in self.nodes.tolist():
+            if index[root] >= 0:
+                continue
+            work = [[root, 0]] # (Node, next successor to look at)
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            onstack[root] = 1
+            while len(work) > 0:
+                frame = work[-1]
+                v = frame[0]
+                if frame[1] < 5:
+                    w = succ[frame[1]][v]
+                    frame[1] += 1
+                    if index[w] < 0:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        onstack[w] = 1
+                        work.append([w, 0])
+                    elif onstack[w] and index[w] < low[v]:
+                        low[v] = index[w]
+                    continue
+                work.pop()
+                if len(work) > 0 and low[v] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[v]
+                if low[v] == index[v]: # v roots a component
+                    while True:
+                        w = stack.pop()
+                        onstack[w] = 0
+                        comp[w] = count
+                        if w == v:
+                            break
+                    count += 1
+        return np.array(comp)
+
+    def two_way(self):
+        # Distinct positions n < m with a move n -> m and a move m -> n
+        pairs = []
+        idx = np.arange(self.M.size)
+        ok = self.M.valid(idx)
+        for a in range(5):
+            m = self.T[a]
+            for b in range(5):
+                hit = np.flatnonzero(ok & (m > idx) & (self.T[b][np.maximum(m, 0)] == idx))
+                pairs.extend(zip(hit.tolist(), m[hit].tolist(), [a]*len(hit), [b]*len(hit)))
+        return sorted(pairs)
+
+    def save(self):
+        summary = {
+            'k': self.k,
+            'states': len(self.nodes),
+            'solvable': len(self.nodes)-len(self.unsolvable),
+            'unsolvable': self.unsolvable.tolist(),
+            'scc_count': sum(self.scc_sizes.values()),
+            'scc_sizes': self.scc_sizes, # SCC size -> number of SCCs that size
+            'goal_scc_size': self.goal_scc,
+            'two_way_pairs': len(set((n, m) for n, m, a, b in self.pairs)),
+        }
+        json.dump(summary, open(self.filename, 'w'), indent=1, sort_keys=True)
+
+        f = open(self.pairs_filename, 'w')
+        f.write("node_a,node_b,move_ab,move_ba\n")
+        vals = self.M.unrank(np.arange(self.M.size))
+        for n, m, a, b in self.pairs:
+            f.write("%d,%d,%s,%s\n" % (vals[n], vals[m], Master.moves[a], Master.moves[b]))
+        f.close()
+        return summary
+
+def load_unsolvable(k):
+    # Unsolvable starts for k digits from a saved analysis; None if not analyzed
+    filename = "analysis_oww_"+str(k)+".json"
+    if not os.path.exists(filename):
+        return None
+    return set(json.load(open(filename))['unsolvable'])
+
+if __name__ == '__main__':
+    # Usage: python analysis.py k [k ...]
+    for k in sys.argv[1:]:
+        A = Analysis(int(k))
+        A.build()
+        summary = A.save()
+        del summary['unsolvable']
+        print json.dumps(summary, sort_keys=True)
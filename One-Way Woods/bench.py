@@ -0,0 +1,143 @@
+# BENCHMARK AND REGRESSION SUITE FOR ONE-WAY WOODS
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from master import Master
+from solver import Solver
+
+# Metrics where bigger is better; every other metric is a cost
+THROUGHPUT = ['move_per_s', 'move_packed_per_s', 'move_digitwise_per_s']
+
+def committed(k):
+    # Path lengths from the committed data_oww_k.csv, if there is one
+    filename = "data_oww_"+str(k)+".csv"
+    if not os.path.exists(filename):
+        return None
+    return dict((int(r[0]), int(r[3])) for r in list(csv.reader(open(filename)))[1:])
+
+def bench_k(args):
+    # Runs in a fresh worker process so peak RSS belongs to this k alone
+    k, seed, starts, modes, moves = args
+    M = Master(k)
+    random.seed(seed) # Master.generate_number draws from the global generator
+    ref = committed(k)
+    result = {'k': k, 'mismatches': 0}
+
+    # Master.move throughput on a fixed sample of positions (with repeats for small k)
+    vals = [M.generate_number() for i in range(moves//5)]
+    t0 = time.time()
+    for n in vals:
+        for d in Master.moves:
+            M.move(d, n)
+    result['move_per_s'] = 5*len(vals)/(time.time()-t0)
+
+    # The packed kernel on its own, and the digit-by-digit reference
+    packed = [M.pack(n) for n in vals]
+    t0 = time.time()
+    for p in packed:
+        for d in Master.moves:
+            M.move_packed(d, p)
+    result['move_packed_per_s'] = 5*len(vals)/(time.time()-t0)
+    t0 = time.time()
+    for n in vals:
+        for d in Master.moves:
+            M.move_digitwise(d, n)
+    result['move_digitwise_per_s'] = 5*len(vals)/(time.time()-t0)
+
+    # Single-solve latency over a seeded set of start nodes
+    nodes = [M.generate_number() for i in range(starts)]
+    for mode in modes:
+        times = []
+        for n in nodes:
+            S = Solver(n, k)
+            S.M = M # Warm, as in an exhaust or the service
+            t0 = time.time()
+            S.solve(False, mode)
+            times.append(time.time()-t0)
+            if ref is not None and S.data[-1][3] != ref[n]:
+                result['mismatches'] += 1
+        result['solve_'+mode+'_mean_s'] = sum(times)/len(times)
+        result['solve_'+mode+'_max_s'] = max(times)
+
+    # Full exhaust, written to a scratch file and checked against the CSV
+    tmp = tempfile.mkdtemp()
+    S = Solver(0, k)
+    S.filename = os.path.join(tmp, "data_oww_"+str(k)+".csv")
+    t0 = time.time()
+    S.exhaust_reverse()
+    result['exhaust_s'] = time.time()-t0
+    if ref is not None:
+        rows = list(csv.reader(open(S.filename)))[1:]
+        result['mismatches'] += abs(len(rows)-len(ref))
+        result['mismatches'] += sum(1 for r in rows if ref.get(int(r[0])) != int(r[3]))
+    shutil.rmtree(tmp)
+
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+def regressions(results, baseline, tolerance):
+    # Metrics more than tolerance (a fraction) worse than the saved baseline
+    flagged = []
+    base = dict((r['k'], r) for r in baseline['results'])
+    for r in results:
+        if r['k'] not in base:
+            continue
+        for metric, value in sorted(r.items()):
+            old = base[r['k']].get(metric)
+            if metric in ['k', 'mismatches'] or not old:
+                continue
+            if metric in THROUGHPUT:
+                worse = value < old/(1+tolerance)
+            else:
+                worse = value > old*(1+tolerance)
+            if worse:
+                flagged.append((r['k'], metric, old, value))
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the One-Way Woods engine")
+    parser.add_argument('--k', type=int, nargs='+', default=[2, 3, 4, 5, 6, 7])
+    parser.add_argument('--seed', type=int, default=2017)
+    parser.add_argument('--starts', type=int, default=10, help="start nodes per single-solve benchmark")
+    parser.add_argument('--modes', nargs='+', default=['bfs', 'astar'])
+    parser.add_argument('--moves', type=int, default=100000, help="Master.move calls per k")
+    parser.add_argument('--out', default="bench_results.json")
+    parser.add_argument('--baseline', default="bench_baseline.json")
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = []
+    for k in args.k:
+        pool = multiprocessing.Pool(1)
+        r = pool.apply(bench_k, [(k, args.seed, args.starts, args.modes, args.moves)])
+        pool.close()
+        pool.join()
+        results.append(r)
+        print json.dumps(r, sort_keys=True)
+
+    report = {'time': time.time(), 'args': vars(args), 'results': results}
+    json.dump(report, open(args.out, 'w'), indent=2, sort_keys=True)
+    if args.save_baseline:
+        json.dump(report, open(args.baseline, 'w'), indent=2, sort_keys=True)
+        print "Saved baseline to", args.baseline
+
+    failed = sum(r['mismatches'] for r in results) > 0
+    if failed:
+        print "CORRECTNESS: path_len differs from the committed CSVs"
+    if not args.save_baseline and os.path.exists(args.baseline):
+        for k, metric, old, new in regressions(results, json.load(open(args.baseline)), args.tolerance):
+            print "REGRESSION: k=%d %s %.6g -> %.6g" % (k, metric, old, new)
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# SOLUTION CACHE FOR ONE-WAY WOODS SOLVER
+from collections import OrderedDict
+
+class SolutionCache:
+    # Bounded LRU map of packed state (Master.pack) -> (optimal path to goal,
+    # node before goal). States have exactly k digits, so games of different
+    # k never collide.
+    def __init__(self, maxsize=10**6):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def peek(self, n): # Look up without touching counters or recency
+        return self.entries.get(n)
+
+    def get(self, n):
+        e = self.entries.pop(n, None)
+        if e is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries[n] = e # Most recently used goes last
+        return e
+
+    def put(self, n, path, prev):
+        self.entries.pop(n, None)
+        self.entries[n] = (path, prev)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def fill(self, M, n, path):
+        # Every state along an optimal path from position n gets the matching suffix
+        vals = [M.pack(n)]
+        for d in path:
+            vals.append(M.move_packed(d, vals[-1]))
+        prev = M.unpack(vals[-2]) if len(path) > 0 else 0
+        for i in range(len(vals)):
+            self.put(vals[i], path[i:], prev if i < len(path) else 0)
@@ -0,0 +1,102 @@
+# PRECOMPUTED DISTANCE/NEXT-MOVE DATABASE FOR ONE-WAY WOODS
+import numpy as np
+import os
+import struct
+import sys
+import time
+from master import Master
+from graph import Node
+
+class Database:
+    # File layout: header, then uint8 distance and uint8 next move per dense index
+    magic = 'OWWD'
+    version = 1
+    header = struct.Struct('<4sBB20s6x') # Magic, version, k, rule fingerprint; 32 bytes
+    none = 255 # Distance or move of nodes cut off from the goal (and the goal's move)
+
+    def __init__(self, k, filename=None):
+        self.k = k
+        self.M = Master(k)
+        self.filename = "data_oww_"+str(k)+".db" if filename is None else filename
+        self.table = None
+
+    def build(self, chunk=2**18):
+        # Backward BFS from the goal written straight into the file's uint8
+        # tables. Each level is one pass over the positions not reached yet,
+        # a chunk at a time, recomputing their successors instead of keeping
+        # a successor table. Memory stays at a few chunks for any k; the file
+        # takes 2*(k+1)**k bytes (2 GB at k=9) and distances must stay below
+        # none. Built under a temporary name and renamed when complete
+        print "Building", self.filename, "..."
+        t0 = time.time()
+        tmp = self.filename+".tmp"
+        f = open(tmp, 'wb')
+        f.write(self.header.pack(self.magic, self.version, self.k, self.M.fingerprint()))
+        f.truncate(self.header.size+2*self.M.size)
+        f.close()
+        table = np.memmap(tmp, dtype=np.uint8, mode='r+', offset=self.header.size, shape=(2, self.M.size))
+        dist, move = table[0], table[1]
+        for i in range(0, self.M.size, chunk):
+            table[:, i:i+chunk] = self.none
+        dist[self.M.rank([self.M.goal])[0]] = 0
+
+        # First move (U, R, D, L, - order) that gets one step closer, as in
+        # Graph.bfs_reverse; positions below base[0] have a leading 0
+        level = 0
+        while True:
+            level += 1
+            found = 0
+            for i in range(int(self.M.base[0]), self.M.size, chunk):
+                idx = np.arange(i, min(i+chunk, self.M.size))
+                idx = idx[dist[idx] == self.none]
+                if len(idx) == 0:
+                    continue
+                near = dist[self.M.successors(idx)] == level-1
+                hit = near.any(axis=0)
+                dist[idx[hit]] = level
+                move[idx[hit]] = np.argmax(near[:, hit], axis=0)
+                found += int(hit.sum())
+            if found == 0: # Everything left is cut off from the goal
+                break
+            if level == self.none-1: # The next level would read as none
+                raise ValueError(self.filename+" only holds distances up to "+str(self.none-2))
+        table.flush()
+        del dist, move, table
+        os.rename(tmp, self.filename)
+        print "Done! Time taken to build:", time.time()-t0, "s"
+
+    def open(self):
+        f = open(self.filename, 'rb')
+        magic, version, k, fingerprint = self.header.unpack(f.read(self.header.size))
+        f.close()
+        if magic != self.magic or version != self.version:
+            raise ValueError(self.filename+" is not a version "+str(self.version)+" OWW database")
+        if k != self.k or fingerprint != self.M.fingerprint():
+            raise ValueError(self.filename+" was built for different rules; rebuild it")
+        self.table = np.memmap(self.filename, dtype=np.uint8, mode='r', offset=self.header.size, shape=(2, self.M.size))
+        return self
+
+    def distance(self, n): # Moves left from position n; None if the goal is out of reach
+        d = self.table[0, self.M.rank([n])[0]]
+        return None if d == self.none else int(d)
+
+    def lookup(self, n):
+        # Follow next-move pointers from n; returns the goal Node like Graph.bfs_driver
+        if self.table is None:
+            self.open()
+        if self.distance(n) is None:
+            return None
+        N = Node(n)
+        p, goal, prev = self.M.pack(n), self.M.pack(self.M.goal), None
+        while p != goal:
+            d = Master.moves[self.table[1, self.M.rank_packed(p)]]
+            prev = p
+            p = self.M.move_packed(d, p)
+            N.path += d
+        N.val = self.M.unpack(p)
+        N.prev = self.M.unpack(prev) if prev is not None else 0
+        return N
+
+if __name__ == '__main__':
+    # Usage: python database.py k
+    Database(int(sys.argv[1])).build()
@@ -1,94 +1,315 @@
 # GRAPH FOR ONE-WAY WOODS SOLVER
 import numpy as np
 import random
+import heapq
+from collections import deque
 from master import Master
+from stats import Stats, TimedMaster
 
 class Graph:
-    def __init__(self, k):
+    def __init__(self, k, M=None, timed=False):
         # Pointers to root, and solution nodes; initially None
         self.root = None
         self.solution = None
-        self.M = Master(k)
+        self.M = Master(k) if M is None else M # Reuse a warm Master if given
+        self.stats = Stats(timed)
+        if timed: # Count and time every move call per direction
+            self.M = TimedMaster(self.M, self.stats)
 
-        # List of values already visited and discovered
-        self.visited = []
-        self.bfs_disc_val = []
+        # Searches run on packed states (see Master.pack) and only convert
+        # back to positions in the solution Node
+        self.goal = self.M.pack(self.M.goal)
 
-        # Queue of nodes to visit in BFS
-        self.bfs_queue = []
+        # Discovered states, each mapped to 5*parent+move (move indexes U, R, D, L, -)
+        self.parent = {}
+
+        # Queue of states to visit in BFS; None marks the end of a level
+        self.bfs_queue = deque()
+        self.level = 0
 
     def init_root(self, val):
         N = Node(val)
         self.root = N
+        self.start = self.M.pack(val)
 
-    def bfs_traversal(self, N):
+    def bfs_traversal(self, n):
         # Check moves in the ff. order: U, R, D, L, Wait (-)
-        directions = ['U', 'R', 'D', 'L', '-']
-        for d in directions:
-            n = self.M.move(d, N.val)
-            if (n not in self.visited) and (n not in self.bfs_disc_val):
-                if d == 'U':
-                    N.up = Node(n, N.path+d)
-                    N.up.prev = N.val
-                    self.bfs_queue.append(N.up)
-                    if self.M.check_goal(N.up.val):
-                        N = N.up
-                        break
-                elif d == 'R':
-                    N.right = Node(n, N.path+d)
-                    N.right.prev = N.val
-                    self.bfs_queue.append(N.right)
-                    if self.M.check_goal(N.right.val):
-                        N = N.right
-                        break
-                elif d == 'D':
-                    N.down = Node(n, N.path+d)
-                    N.down.prev = N.val
-                    self.bfs_queue.append(N.down)
-                    if self.M.check_goal(N.down.val):
-                        N = N.down
-                        break
-                elif d == 'L':
-                    N.left = Node(n, N.path+d)
-                    N.left.prev = N.val
-                    self.bfs_queue.append(N.left)
-                    if self.M.check_goal(N.left.val):
-                        N = N.left
-                        break
-                elif d == '-':
-                    N.wait = Node(n, N.path+d)
-                    N.wait.prev = N.val
-                    self.bfs_queue.append(N.wait)
-                    if self.M.check_goal(N.wait.val):
-                        N = N.wait
-                        break
-                self.bfs_disc_val.append(n)
-        self.visited.append(N.val)
-        
-        if self.M.check_goal(N.val):
-            self.solution = N
-            return True
+        for i in range(5):
+            m = self.M.move_packed(Master.moves[i], n)
+            self.stats.generated += 1
+            if m not in self.parent:
+                self.parent[m] = 5*n+i
+                self.stats.depth = self.level+1
+                if m == self.goal:
+                    self.solution = self.trace(m)
+                    return True
+                self.bfs_queue.append(m)
+            else:
+                self.stats.duplicates += 1
         return False
 
     def bfs_driver(self):
         # Enqueue root as initial point
-        self.bfs_queue.append(self.root)
-        self.bfs_disc_val.append(self.root.val)
-        
+        self.parent[self.start] = -1
+        if self.start == self.goal:
+            self.solution = self.root
+            return self.solution
+        self.bfs_queue.append(self.start)
+        self.bfs_queue.append(None)
+
         while len(self.bfs_queue) > 0:
-            if(self.bfs_traversal(self.bfs_queue.pop(0))):
+            n = self.bfs_queue.popleft()
+            if n is None: # Level done; mark the next one if anything is left
+                if len(self.bfs_queue) > 0:
+                    self.level += 1
+                    self.bfs_queue.append(None)
+                continue
+            self.stats.expanded += 1
+            self.stats.frontier(len(self.bfs_queue))
+            if(self.bfs_traversal(n)):
                 break
         return self.solution
 
+    def bfs_bidirectional(self):
+        # Grow one frontier from the root and one from the goal (through
+        # Master.unmove_packed), a full level at a time on the smaller side;
+        # the first state both sides discover lies on a shortest path
+        self.parent[self.start] = -1
+        self.child = {self.goal: -1} # State -> 5*child+move, toward the goal
+        if self.start == self.goal:
+            self.solution = self.root
+            return self.solution
+
+        fwd, bwd = [self.start], [self.goal]
+        meet = None
+        while len(fwd) > 0 and len(bwd) > 0 and meet is None:
+            self.stats.frontier(len(fwd)+len(bwd))
+            self.stats.depth += 1
+            frontier = []
+            if len(fwd) <= len(bwd):
+                for n in fwd:
+                    self.stats.expanded += 1
+                    for i in range(5):
+                        m = self.M.move_packed(Master.moves[i], n)
+                        self.stats.generated += 1
+                        if m not in self.parent:
+                            self.parent[m] = 5*n+i
+                            frontier.append(m)
+                            if m in self.child:
+                                meet = m
+                                break
+                        else:
+                            self.stats.duplicates += 1
+                    if meet is not None:
+                        break
+                fwd = frontier
+            else:
+                for n in bwd:
+                    self.stats.expanded_bwd += 1
+                    for i in range(5):
+                        for m in self.M.unmove_packed(Master.moves[i], n):
+                            self.stats.generated += 1
+                            if m not in self.child:
+                                self.child[m] = 5*n+i
+                                frontier.append(m)
+                                if m in self.parent:
+                                    meet = m
+                                    break
+                            else:
+                                self.stats.duplicates += 1
+                        if meet is not None:
+                            break
+                    if meet is not None:
+                        break
+                bwd = frontier
+
+        if meet is not None:
+            # Join the root-to-meet path with the meet-to-goal walk
+            N = self.trace(meet)
+            path, prev = [N.path], N.prev
+            m = meet
+            while self.child[m] >= 0:
+                prev = self.M.unpack(m)
+                m, i = divmod(self.child[m], 5)
+                path.append(Master.moves[i])
+            self.solution = Node(self.M.unpack(m), ''.join(path))
+            self.solution.prev = prev
+        return self.solution
+
+    def bfs_cached(self, cache):
+        # BFS that stops once a cached state offers a path no unexplored
+        # level can beat; cache maps packed states to (path, node before goal)
+        self.parent[self.start] = -1
+        if self.start == self.goal:
+            self.solution = self.root
+            return self.solution
+
+        best = None # (Total length, cached state)
+        frontier, depth = [self.start], 0
+        while len(frontier) > 0 and (best is None or depth+1 < best[0]):
+            self.stats.frontier(len(frontier))
+            self.stats.depth = depth+1
+            level = []
+            for n in frontier:
+                self.stats.expanded += 1
+                for i in range(5):
+                    m = self.M.move_packed(Master.moves[i], n)
+                    self.stats.generated += 1
+                    if m in self.parent:
+                        self.stats.duplicates += 1
+                    else:
+                        self.parent[m] = 5*n+i
+                        if m == self.goal:
+                            self.solution = self.trace(m)
+                            return self.solution
+                        e = cache.peek(m)
+                        if e is not None and (best is None or depth+1+len(e[0]) < best[0]):
+                            best = (depth+1+len(e[0]), m)
+                        level.append(m)
+            frontier, depth = level, depth+1
+
+        if best is not None:
+            # Every path shorter than best would have reached the goal by now
+            N = self.trace(best[1])
+            path, prev = cache.get(best[1])
+            self.solution = Node(self.M.goal, N.path+path)
+            self.solution.prev = prev
+        return self.solution
+
+    def astar(self, pdb, target=None):
+        # A* on f = g+h; pdb.h (of a packed state) is consistent, so a state is
+        # never reopened. target replaces the goal when pdb bounds the
+        # distance to it instead
+        goal = self.goal if target is None else self.M.pack(target)
+        self.parent[self.start] = -1
+        g = {self.start: 0}
+        heap = [(pdb.h(self.start), 0, self.start)]
+        closed = set()
+        while len(heap) > 0:
+            f, c, n = heapq.heappop(heap)
+            if n in closed:
+                continue
+            if n == goal:
+                self.solution = self.trace(n)
+                break
+            closed.add(n)
+            self.stats.expanded += 1
+            self.stats.frontier(len(heap))
+            for i in range(5):
+                m = self.M.move_packed(Master.moves[i], n)
+                self.stats.generated += 1
+                if m not in closed and (m not in g or g[n]+1 < g[m]):
+                    g[m] = g[n]+1
+                    self.stats.depth = max(self.stats.depth, g[m])
+                    self.parent[m] = 5*n+i
+                    heapq.heappush(heap, (g[m]+pdb.h(m), -g[m], m)) # Deeper first on ties
+                else:
+                    self.stats.duplicates += 1
+        return self.solution
+
+    def ida_star(self, pdb):
+        # Iterative deepening on f = g+h; memory grows only with the path length
+        path, vals = [], [self.start]
+        on_path = set(vals)
+
+        def dfs(n, g, bound): # Returns True on reaching the goal, else the next bound (None if there is none)
+            f = g+pdb.h(n)
+            if f > bound:
+                return f
+            if n == self.goal:
+                return True
+            self.stats.expanded += 1
+            self.stats.frontier(len(vals))
+            self.stats.depth = max(self.stats.depth, g+1)
+            least = float('inf')
+            for i in range(5):
+                m = self.M.move_packed(Master.moves[i], n)
+                self.stats.generated += 1
+                if m in on_path:
+                    self.stats.duplicates += 1
+                    continue
+                path.append(Master.moves[i])
+                vals.append(m)
+                on_path.add(m)
+                t = dfs(m, g+1, bound)
+                if t is True:
+                    return True
+                path.pop()
+                vals.pop()
+                on_path.remove(m)
+                if t is not None and t < least:
+                    least = t
+            return None if least == float('inf') else least
+
+        bound = pdb.h(self.start)
+        while True:
+            t = dfs(self.start, 0, bound)
+            if t is True:
+                self.solution = Node(self.M.unpack(vals[-1]), ''.join(path))
+                self.solution.prev = self.M.unpack(vals[-2]) if len(path) > 0 else 0
+                break
+            if t is None or t >= np.iinfo(np.int32).max: # Goal out of reach
+                break
+            bound = t
+        return self.solution
+
+    def trace(self, n):
+        # Rebuild the path to packed state n from the parent pointers
+        path = []
+        m = n
+        while self.parent[m] >= 0:
+            m, i = divmod(self.parent[m], 5)
+            path.append(Master.moves[i])
+        N = Node(self.M.unpack(n), ''.join(reversed(path)))
+        N.prev = self.M.unpack(self.parent[n]//5) if self.parent[n] >= 0 else 0
+        return N
+
+    def bfs_reverse(self, T=None, with_prev=True):
+        # Multi-target BFS outward from the goal over Master's successor table;
+        # every returned array is indexed by dense state index. Holds the whole
+        # int32[5, (k+1)**k] table plus dist (and prev, unless with_prev is
+        # False, when None comes back in its place): about 33 bytes per state,
+        # 1.4 GB at k=8. Database.build needs neither and scales to k=9
+        self.table = self.M.successor_table() if T is None else T
+        goal = self.M.rank([self.M.goal])[0]
+        dist = np.full(self.M.size, -1, dtype=np.int32)
+        dist[goal] = 0
+        self.levels = [np.array([goal])] # Dense indices grouped by distance
+
+        todo = np.flatnonzero(self.M.valid(np.arange(self.M.size)))
+        todo = todo[todo != goal]
+        while len(todo) > 0:
+            hit = (dist[self.table[:, todo]] == len(self.levels)-1).any(axis=0)
+            if not hit.any(): # Everything left is cut off from the goal
+                break
+            dist[todo[hit]] = len(self.levels)
+            self.levels.append(todo[hit])
+            todo = todo[~hit]
+
+        # First move (U, R, D, L, - order) that gets one step closer gives the
+        # same path bfs_driver finds; pre-goal nodes are inherited from it
+        move = np.full(self.M.size, -1, dtype=np.int8)
+        prev = np.zeros(self.M.size, dtype=np.int64) if with_prev else None
+        for L in range(1, len(self.levels)):
+            nodes = self.levels[L]
+            step = np.argmax(dist[self.table[:, nodes]] == L-1, axis=0)
+            move[nodes] = step
+            if with_prev:
+                nxt = self.table[step, nodes]
+                prev[nodes] = np.where(nxt == goal, self.M.unrank(nodes), prev[nxt])
+        return dist, move, prev
+
+    def reverse_paths(self, move):
+        # Path strings for every node reached by bfs_reverse, built from the goal outward
+        path = {self.levels[0][0]: ''}
+        for nodes in self.levels[1:]:
+            nxt = self.table[move[nodes], nodes]
+            for i, j, d in zip(nodes.tolist(), nxt.tolist(), move[nodes].tolist()):
+                path[i] = Master.moves[d]+path[j]
+        return path
+
 class Node:
     def __init__(self, val, path=""):
-        # Determines values of resulting actions
-        self.up = None
-        self.right = None
-        self.down = None
-        self.left = None
-        self.wait = None
-
         # Current and Previous Node Values and Path
         self.prev = 0
         self.val = val
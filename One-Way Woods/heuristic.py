@@ -0,0 +1,78 @@
+# PATTERN DATABASE HEURISTIC FOR ONE-WAY WOODS
+import numpy as np
+import csv
+import sys
+from master import Master
+
+class PatternDatabase:
+    # Abstract state (r, v[0..p-1]): window digits v[t] sit at positions (r+t)%k.
+    # Directional moves act on the window through Master's lookup tables; Wait
+    # adds any rotation e the window's digits allow (rest of the number unknown).
+    # Distances in this relaxed graph never exceed the real ones, and taking
+    # the max over all k window placements keeps the heuristic consistent.
+    def __init__(self, M, p=None):
+        self.M = M
+        self.k = M.k
+        self.p = min(self.k, 4) if p is None else p
+        self.weights = (self.k+1)**np.arange(self.p-1, -1, -1, dtype=np.int64)
+        self.span = (self.k+1)**self.p # Abstract states per offset r
+        self.dist = self.build()
+
+    def build(self):
+        k, p = self.k, self.p
+        idx = np.arange(k*self.span, dtype=np.int64)
+        r = idx//self.span
+        V = (idx[:, None]%self.span//self.weights)%(k+1)
+        pos = (r[:, None]+np.arange(p)[None, :])%k
+
+        # Successors in the ff. order: U, R, D, L, then Wait by e = 1..k
+        succ = np.full([4+k, len(idx)], -1, dtype=np.int64)
+        for d in range(4):
+            succ[d] = r*self.span+self.M.tables[d, pos, V].astype(np.int64).dot(self.weights)
+        for e in range(1, k+1):
+            last = k-e # Position of the last non-zero digit before the rotation
+            ok = ((pos < last) | ((pos == last) & (V != 0)) | ((pos > last) & (V == 0))).all(axis=1)
+            succ[3+e, ok] = ((r[ok]+e)%k)*self.span+idx[ok]%self.span
+
+        # Level-synchronous BFS toward every abstract goal at once
+        dist = np.full(len(idx), -1, dtype=np.int32)
+        dist[(V == pos+1).all(axis=1)] = 0
+        level = 0
+        while True:
+            todo = np.flatnonzero(dist < 0)
+            S = succ[:, todo]
+            hit = ((S >= 0) & (dist[np.maximum(S, 0)] == level)).any(axis=0)
+            if not hit.any():
+                break
+            level += 1
+            dist[todo[hit]] = level
+        dist[dist < 0] = np.iinfo(np.int32).max # No completion of the window reaches the goal
+        return dist
+
+    def h(self, p): # Lower bound on moves from packed state p to the goal
+        v = self.M.digits_packed(p)
+        best = 0
+        for a in range(self.k):
+            i = a*self.span
+            for t in range(self.p):
+                i += v[(a+t)%self.k]*self.weights[t]
+            best = max(best, self.dist[i])
+        return best
+
+def check(k):
+    # Compare A* and IDA* with the committed BFS results for k digits
+    from solver import Solver
+    rows = list(csv.reader(open("data_oww_"+str(k)+".csv")))[1:]
+    expanded = {'bfs': 0, 'astar': 0, 'idastar': 0}
+    for r in rows:
+        for mode in ['bfs', 'astar', 'idastar']:
+            S = Solver(int(r[0]), k)
+            S.solve(False, mode)
+            expanded[mode] += S.graph.stats.expanded
+            if S.data[-1][3] != int(r[3]):
+                print "MISMATCH:", mode, r[0], S.data[-1][3], r[3]
+    print k, "digits, nodes expanded:", expanded
+
+if __name__ == '__main__':
+    # Usage: python heuristic.py k
+    check(int(sys.argv[1]))
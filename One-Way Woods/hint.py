@@ -0,0 +1,54 @@
+# BACKGROUND HINT SOLVER FOR ONE-WAY WOODS
+import multiprocessing
+import time
+from solver import Solver
+
+def solve_hint(n, k, mode, conn):
+    # Runs in the background process; sends back the solver's CSV row (None if unsolvable)
+    S = Solver(n, k)
+    S.solve(False, mode)
+    conn.send(S.data[-1] if len(S.data) > 0 else None)
+    conn.close()
+
+class Hint:
+    # Solves the current position in a background process while the player
+    # thinks; moving elsewhere terminates it and starts over from the new position
+    def __init__(self, k, mode):
+        self.k = k
+        self.mode = mode
+        self.n = None
+        self.process = None
+        self.conn = None
+
+    def start(self, n):
+        self.cancel()
+        self.n = n
+        self.conn, conn = multiprocessing.Pipe(False)
+        self.process = multiprocessing.Process(target=solve_hint, args=(n, self.k, self.mode, conn))
+        self.process.daemon = True
+        self.process.start()
+        conn.close() # The child's end; with it closed here, a dead child reads as EOF
+
+    def cancel(self):
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def ready(self):
+        return self.conn is not None and self.conn.poll()
+
+    def result(self):
+        # Returns the row and how long the player had to wait for it; if the
+        # background process died, says so, starts a new one and returns (None, None)
+        t0 = time.time()
+        try:
+            row = self.conn.recv()
+        except (EOFError, IOError):
+            print "No hint available; the background solver stopped. Restarting it..."
+            self.start(self.n)
+            return None, None
+        waited = time.time()-t0
+        self.cancel()
+        return row, waited
@@ -0,0 +1,150 @@
+# LANDMARK (ALT) DISTANCE INDEX FOR ONE-WAY WOODS
+import numpy as np
+import os
+import random
+import sys
+import time
+from master import Master
+
+class LandmarkIndex:
+    # Exact distances to and from a few landmark positions, the goal first.
+    # For any target t the triangle inequality gives
+    #   d(n,t) >= d(n,L)-d(t,L)  and  d(n,t) >= d(L,t)-d(L,n)
+    # for every landmark L; the max over them is a consistent A* heuristic
+    none = 255 # Distance of positions on the far side of a one-way move
+
+    def __init__(self, M, count=16, filename=None):
+        self.M = M
+        self.k = M.k
+        self.count = count
+        self.filename = "landmarks_oww_"+str(self.k)+".npz" if filename is None else filename
+        self.landmarks = []
+        self.to = None # to[i, j]: moves from dense index i to landmark j
+        self.frm = None # frm[i, j]: moves from landmark j to dense index i
+
+    def bfs(self, T, start, forward):
+        # Distances from (forward) or to dense index start over the successor table T
+        dist = np.full(self.M.size, self.none, dtype=np.uint8)
+        dist[start] = 0
+        frontier = np.array([start])
+        todo = np.flatnonzero(self.M.valid(np.arange(self.M.size)))
+        todo = todo[todo != start]
+        level = 0
+        while len(frontier) > 0 and len(todo) > 0:
+            if forward:
+                nxt = np.unique(T[:, frontier])
+                frontier = nxt[dist[nxt] == self.none]
+            else:
+                hit = (dist[T[:, todo]] == level).any(axis=0)
+                frontier, todo = todo[hit], todo[~hit]
+            level += 1
+            dist[frontier] = level
+        return dist
+
+    def build(self, T=None):
+        # Goal first, then each next landmark as far as possible (both ways
+        # round) from the ones already chosen, within the goal's SCC: a
+        # landmark hardly anything can reach bounds next to nothing
+        print "Building", self.count, "landmarks for", self.k, "digits..."
+        t0 = time.time()
+        T = self.M.successor_table() if T is None else T
+        legal = self.M.valid(np.arange(self.M.size))
+        self.landmarks = [int(self.M.rank([self.M.goal])[0])]
+        to, frm = [], []
+        spread = np.full(self.M.size, np.iinfo(np.int32).max, dtype=np.int64)
+        while True:
+            L = self.landmarks[-1]
+            to.append(self.bfs(T, L, False))
+            frm.append(self.bfs(T, L, True))
+            spread = np.minimum(spread, to[-1].astype(np.int64)+frm[-1])
+            if len(self.landmarks) == self.count:
+                break
+            spread[~legal | (to[0] == self.none) | (frm[0] == self.none)] = -1
+            spread[self.landmarks] = -1
+            self.landmarks.append(int(np.argmax(spread)))
+        self.to, self.frm = np.array(to).T.copy(), np.array(frm).T.copy() # One row per position
+        print "Done! Time taken to build:", time.time()-t0, "s"
+        return self
+
+    def save(self):
+        np.savez(self.filename, landmarks=self.landmarks, to=self.to, frm=self.frm,
+                 fingerprint=np.frombuffer(self.M.fingerprint(), dtype=np.uint8))
+        return self
+
+    def load(self):
+        f = np.load(self.filename)
+        if f['fingerprint'].tostring() != self.M.fingerprint():
+            raise ValueError(self.filename+" was built for different rules; rebuild it")
+        self.landmarks = f['landmarks'].tolist()
+        self.to, self.frm = f['to'], f['frm']
+        self.count = len(self.landmarks)
+        return self
+
+    def open(self):
+        # Load the saved index if there is one, else build it (not saved)
+        if os.path.exists(self.filename):
+            return self.load()
+        return self.build()
+
+    def heuristic(self, target):
+        return LandmarkHeuristic(self, target)
+
+class LandmarkHeuristic:
+    # The index's lower bound on moves to one target, with Graph.astar's h(p)
+    def __init__(self, index, target):
+        self.index = index
+        self.M = index.M
+        t = int(str(target), self.M.k+1) # Digits 0..k read in base k+1 give the dense index
+        self.to_t = index.to[t].astype(np.int32)
+        self.frm_t = index.frm[t].astype(np.int32)
+        self.to_known = self.to_t != index.none
+        self.frm_unknown = self.frm_t == index.none
+
+    def h(self, p): # p is a packed state
+        i = self.M.rank_packed(p)
+        to_n = self.index.to[i].astype(np.int32)
+        frm_n = self.index.frm[i].astype(np.int32)
+        none = self.index.none
+        # n can't reach t if t reaches a landmark n can't, or L reaches n but not t
+        if ((to_n == none) & self.to_known).any() or ((frm_n != none) & self.frm_unknown).any():
+            return np.iinfo(np.int32).max
+        a = np.where(self.to_known & (to_n != none), to_n-self.to_t, 0)
+        b = np.where(~self.frm_unknown & (frm_n != none), self.frm_t-frm_n, 0)
+        return max(0, a.max(), b.max())
+
+def check(k, pairs=20, count=16, seed=2017):
+    # Random start/target pairs: landmark A* against exact BFS distances, and
+    # the nodes each expands
+    from solver import Solver
+    M = Master(k)
+    index = LandmarkIndex(M, count)
+    T = M.successor_table()
+    if os.path.exists(index.filename):
+        index.load()
+    else:
+        index.build(T)
+    Solver.landmarks[k] = index
+    random.seed(seed)
+    expanded = {'bfs': 0, 'landmark': 0}
+    for p in range(pairs):
+        n, t = M.generate_number(), M.generate_number()
+        d = index.bfs(T, M.rank([n])[0], True)
+        exact = d[M.rank([t])[0]]
+        S = Solver(n, k)
+        S.M = M
+        S.solve(False, target=t)
+        expanded['landmark'] += S.graph.stats.expanded
+        expanded['bfs'] += int((d < exact).sum()) # Levels BFS finishes before reaching t
+        if exact == index.none:
+            if len(S.data) > 0:
+                print "MISMATCH:", n, t, "solved but unreachable"
+        elif len(S.data) == 0 or S.data[-1][3] != exact:
+            print "MISMATCH:", n, t, S.data[-1][3] if len(S.data) > 0 else None, exact
+    print k, "digits,", pairs, "pairs, nodes expanded:", expanded
+
+if __name__ == '__main__':
+    # Usage: python landmark.py k [count]  (builds and saves, then checks)
+    k = int(sys.argv[1])
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    LandmarkIndex(Master(k), count).build().save()
+    check(k, count=count)
@@ -1,17 +1,42 @@
 # MASTER CONTROL FOR ONE-WAY WOODS
 import numpy as np
 import random
+import itertools
+import hashlib
 
 class Master:
-    def __init__(self, k): # k is how many digits needed; 2 <= k <= 9
+    lazy = ['tables', 'inverse', 'packed', 'unpacked'] # Built by build_<name> on first use
+    moves = ['U', 'R', 'D', 'L', '-'] # A move's index here is what parent pointers and the database store
+
+    def __init__(self, k, rules=None): # k is how many digits needed; 2 <= k <= 9
+        # rules overrides the rule matrix: 4 rows (operations 1-4) by k columns
+        # (digit positions), each column a permutation of U, R, D, L
         self.k = k
-        self.directions = ['U', 'R', 'D', 'L']
+        self.directions = Master.moves[:4]
         self.rules = np.empty([4, self.k], dtype=str)
         self.goal = self.generate_goal()
 
-        self.build_rules()
+        if rules is None:
+            self.build_rules()
+        else:
+            self.rules[:] = np.array([list(r) for r in rules])
+            for col in range(self.k):
+                if sorted(self.rules[:, col]) != sorted(self.directions):
+                    raise ValueError("rule column "+str(col)+" is not a permutation of U, R, D, L")
+
+        # Positional weights for the decimal encoding and the dense base-(k+1) index
+        self.dec = 10**np.arange(self.k-1, -1, -1, dtype=np.int64)
+        self.base = (self.k+1)**np.arange(self.k-1, -1, -1, dtype=np.int64)
+        self.size = (self.k+1)**self.k
+
+    def __getattr__(self, name):
+        # Only called for attributes not set yet: a Master that just checks
+        # goals or ranks positions never pays for the lookup tables
+        if name in Master.lazy:
+            setattr(self, name, getattr(self, 'build_'+name)())
+            return self.__dict__[name]
+        raise AttributeError(name)
 
-    """
     def build_rules0(self):
         # Fill the matrix in this order: U, D, R, L
         row, col = 0, 0 # row and col are anchors
@@ -49,7 +74,6 @@ class Master:
                         break
                     while self.rules[row, col] in self.directions:
                         row = (row+1) % 4
-    """
 
     def build_rules(self):
         # Fill the matrix in this order: U, R, D, L
@@ -98,16 +122,18 @@ class Master:
         return False
 
     def parse_direction(self, d): # d is a direction: U, D, R, L
-        d_dict = {'U': '1423',
-                  'R': '2314',
-                  'D': '3241',
-                  'L': '4132'} # Based on the current set of rules
         p = '' # Parse string to determine operation per digit
-        for i in range(self.k):
-            p += d_dict[d][i%4]
+        for i in range(self.k): # The row holding d in column i is its operation
+            p += str(list(self.rules[:, i]).index(d)+1)
         return p
 
     def move(self, d, n): # d is a direction or Wait, n is the current position
+        if d in self.packed: # Searches call move_packed directly and skip the conversions
+            return self.unpack(self.move_packed(d, self.pack(n)))
+        print("\nERROR! Input not recognized.\n")
+        return n
+
+    def move_digitwise(self, d, n): # Reference digit-by-digit version of move
         if d == '-': # If Wait...
             e = 1 # Marker to last digit; for modulo
             while n%(10**e) == 0:
@@ -118,14 +144,7 @@ class Master:
             n_str = str(n)
             n = ''
             for i in range(self.k): # Iterate through the number's digits
-                if p[i] == '1': # Addition
-                     digit = (int(n_str[i])+(i+1))%(self.k+1)
-                elif p[i] == '2': # Subtraction
-                    digit = (int(n_str[i])-(i+1))%(self.k+1)
-                elif p[i] == '3': # Multiplication
-                    digit = (int(n_str[i])*(i+1))%(self.k+1)
-                elif p[i] == '4': # Exponentiation
-                    digit = (int(n_str[i])**((i+1)%10))%(self.k+1)
+                digit = self.operate(p[i], i, int(n_str[i]))
                 if i == 0 and digit == 0:
                     digit += 1
                 n += str(digit)
@@ -133,3 +152,161 @@ class Master:
         else:
             print("\nERROR! Input not recognized.\n")
         return n
+
+    def operate(self, op, i, v): # op is from parse_direction, i is the digit position, v is its value
+        if op == '1': # Addition
+            return (v+(i+1))%(self.k+1)
+        elif op == '2': # Subtraction
+            return (v-(i+1))%(self.k+1)
+        elif op == '3': # Multiplication
+            return (v*(i+1))%(self.k+1)
+        elif op == '4': # Exponentiation
+            return (v**((i+1)%10))%(self.k+1)
+
+    def build_tables(self):
+        # Lookup table [direction, position, digit] -> new digit, leading-zero fix included
+        t = np.zeros([4, self.k, self.k+1], dtype=np.int8)
+        for d in range(4):
+            p = self.parse_direction(self.directions[d])
+            for i in range(self.k):
+                for v in range(self.k+1):
+                    t[d, i, v] = self.operate(p[i], i, v)
+        t[:, 0, :][t[:, 0, :] == 0] = 1
+        return t
+
+    def fingerprint(self):
+        # Digest of the rule matrix and the operation tables derived from it
+        return hashlib.sha1(self.rules.tostring()+self.tables.tostring()).digest()
+
+    def build_packed(self):
+        # Packed state: one 4-bit nibble per digit, leading digit highest. Each
+        # direction gets, per group of up to 3 digits, a lookup from the group's
+        # nibbles to its already shifted result; Wait needs no table
+        packed = {'-': None}
+        for d in range(4):
+            groups = []
+            i = self.k # Groups run from the last digit toward the leading one
+            while i > 0:
+                w = min(3, i)
+                x = np.arange(16**w)
+                out = np.zeros(16**w, dtype=np.int64)
+                for j in range(w):
+                    nib = (x >> 4*(w-1-j)) & 15
+                    out |= self.tables[d, i-w+j, np.minimum(nib, self.k)].astype(np.int64) << 4*(w-1-j)
+                groups.append((4*(self.k-i), 16**w-1, (out << 4*(self.k-i)).tolist()))
+                i -= w
+            packed[self.directions[d]] = groups
+        return packed
+
+    def move_packed(self, d, p): # Same as move, on a packed state p
+        if d == '-': # Rotate right past the last non-zero digit
+            e = ((p & -p).bit_length()+3)//4
+            return (p >> 4*e) | ((p & ((1 << 4*e)-1)) << 4*(self.k-e))
+        n = 0
+        for shift, mask, table in self.packed[d]:
+            n |= table[(p >> shift) & mask]
+        return n
+
+    def pack(self, n): # Position -> packed state
+        return int(str(n), 16)
+
+    def unpack(self, p): # Packed state -> position
+        return int('%x' % p)
+
+    def digits_packed(self, p): # Packed state -> list of its k digits, leading first
+        return [(p >> 4*(self.k-1-i)) & 15 for i in range(self.k)]
+
+    def rank_packed(self, p): # Packed state -> dense index, like rank
+        i = 0
+        for v in self.digits_packed(p):
+            i = i*(self.k+1)+v
+        return i
+
+    def build_inverse(self):
+        # inverse[d][i][v] lists the digits at position i that direction d maps to v
+        inv = [[[[] for v in range(self.k+1)] for i in range(self.k)] for d in range(4)]
+        for d in range(4):
+            for i in range(self.k):
+                for u in range(1 if i == 0 else 0, self.k+1): # Leading digit is never 0
+                    inv[d][i][self.tables[d, i, u]].append(str(u))
+        return inv
+
+    def unmove(self, d, n): # Inverse of move: every position that d takes to n
+        n_str = str(n)
+        if d == '-': # If Wait...
+            prev = []
+            for e in range(1, self.k+1): # Undo a shift past e-1 skipped zeros
+                if n_str[1:e] != '0'*(e-1):
+                    break
+                if e == self.k or n_str[e] != '0':
+                    prev.append(int(n_str[e:]+n_str[:e]))
+            return prev
+        elif d in self.directions:
+            inv = self.inverse[self.directions.index(d)]
+            return [int(''.join(p)) for p in itertools.product(*[inv[i][int(n_str[i])] for i in range(self.k)])]
+        else:
+            print("\nERROR! Input not recognized.\n")
+        return []
+
+    def build_unpacked(self):
+        # unpacked[d][i][v] lists, already shifted into digit i's nibble, the
+        # digits that direction d maps to v there
+        return [[[[int(u) << 4*(self.k-1-i) for u in self.inverse[d][i][v]] for v in range(self.k+1)]
+                 for i in range(self.k)] for d in range(4)]
+
+    def unmove_packed(self, d, p): # Same as unmove, on a packed state p
+        if d == '-': # Undo a rotation past e-1 skipped zeros
+            prev = []
+            full = (1 << 4*self.k)-1
+            for e in range(1, self.k+1):
+                if e > 1 and (p >> 4*(self.k-e)) & 15 != 0: # Digit e-1 is not zero
+                    break
+                if e == self.k or (p >> 4*(self.k-1-e)) & 15 != 0:
+                    prev.append(((p << 4*e) & full) | (p >> 4*(self.k-e)))
+            return prev
+        inv = self.unpacked[self.directions.index(d)]
+        return [sum(c) for c in itertools.product(*[inv[i][(p >> 4*(self.k-1-i)) & 15] for i in range(self.k)])]
+
+    def digits(self, n): # n is an array of positions (decimal encoding)
+        return ((np.asarray(n, dtype=np.int64)[:, None]//self.dec)%10).astype(np.int8)
+
+    def undigits(self, D): # D is a digit matrix, one position per row
+        return D.astype(np.int64).dot(self.dec)
+
+    def rank(self, n): # Decimal encoding -> dense index in 0..(k+1)**k-1
+        return self.digits(n).astype(np.int64).dot(self.base)
+
+    def unrank(self, idx): # Dense index -> decimal encoding
+        D = (np.asarray(idx, dtype=np.int64)[:, None]//self.base)%(self.k+1)
+        return self.undigits(D)
+
+    def valid(self, idx): # Dense indices whose leading digit is a legal 1..k
+        return np.asarray(idx, dtype=np.int64) >= self.base[0]
+
+    def successors(self, states): # states is a digit matrix or an array of dense indices
+        states = np.asarray(states)
+        if states.ndim == 2:
+            D = states.astype(np.int64)
+        else:
+            D = (states.astype(np.int64)[:, None]//self.base)%(self.k+1)
+        rows = np.arange(len(D))[:, None]
+        cols = np.arange(self.k)[None, :]
+
+        # Successors in the ff. order: U, R, D, L, Wait (-)
+        succ = np.empty([5, len(D)], dtype=np.int32)
+        for d in range(4):
+            succ[d] = self.tables[d, cols, D].astype(np.int64).dot(self.base)
+
+        # Wait: rotate right so the last non-zero digit leads
+        last = self.k-1-np.argmax(D[:, ::-1] != 0, axis=1)
+        succ[4] = D[rows, (cols+last[:, None])%self.k].dot(self.base)
+
+        succ[:, D[:, 0] == 0] = -1 # Not a legal position
+        return succ
+
+    def successor_table(self, chunk=2**20):
+        # int32[5, (k+1)**k] successor table over the whole dense state space
+        T = np.empty([5, self.size], dtype=np.int32)
+        for i in range(0, self.size, chunk):
+            T[:, i:i+chunk] = self.successors(np.arange(i, min(i+chunk, self.size)))
+        return T
@@ -50,6 +50,8 @@ Math Operations:
 Methods:
     build_rules(): Build the operation/rule matrix based on the number of digits
         used in the game.
+    build_rules0(): Older layout of the rule matrix; pass any 4 x k matrix as
+        Master(k, rules) to play (or sweep.py to compare) other layouts.
     generate_number(): Generate the starting number (n). May repeat if generated
         number equals the goal number.
     generate_goal(): Generate the goal number (n) based on the number of digits used
@@ -63,12 +65,19 @@ Methods:
 """
 
 import numpy as np
+import os
 import time
+import multiprocessing
 from master import Master
 from solver import Solver
+from hint import Hint
 
 k = 5
 M = Master(k)
+if os.path.exists("data_oww_"+str(k)+".db"): # Built by database.py
+    hint = Hint(k, 'database')
+else:
+    hint = Hint(k, 'bidirectional')
 
 # START GAME HERE
 n = M.generate_goal()
@@ -77,6 +86,7 @@ while (M.check_goal(n)):
 
 name = raw_input("Tell me your name: ")
 print("To get out, you must reach Position "+str(M.generate_goal()))
+hint.start(n) # Solve in the background while the player thinks
 while (not M.check_goal(n)):
     print("\n================ ONE-WAY WOODS (OWW) ================")
     print(name+", what do you want to do?\nACT:\n[U] Go Up/Forward\n[D] Go Down/Back\n[L] Go Left\n[R] Go Right\n[-] Wait\n\nOTHER:\n[S] Show Me The Way\n[E] Exhaust Nodes\n[Q] Quit\n")
@@ -86,15 +96,31 @@ while (not M.check_goal(n)):
         break
     elif (i.upper() == 'S'):
         print("You giving up? Ha! Weak...")
-        t0 = time.time()
-        Solver(n, k).solve(True)
-        print "Time to solve:", time.time()-t0, "s"
+        was_ready = hint.ready()
+        row, waited = hint.result()
+        if waited is None: # No hint this time; the solver is running again
+            continue
+        if row is None:
+            print "No path to goal from", n
+        else:
+            print "\n***********************"
+            print n, row[2], M.goal, "\n***********************"
+            print "Time to solve:", row[4], "s"
+            if was_ready:
+                print "No wait; all of it was hidden behind think time"
+            else:
+                print "Waited", waited, "s;", max(row[4]-waited, 0), "s of it was hidden behind think time"
         break
     elif (i.upper() == 'E'):
-        Solver(n, k).exhaust_nodes()
+        hint.cancel()
+        Solver(n, k).exhaust_nodes(multiprocessing.cpu_count())
         break
     else:
-        n = M.move(i.upper(), n)
+        m = M.move(i.upper(), n)
+        if m != n: # New position; the old hint is no use anymore
+            n = m
+            hint.start(n)
+hint.cancel()
 
 if M.check_goal(n):
     print("\nCurrent Position: "+str(n))
@@ -109,5 +135,10 @@ OBSERVATIONS:
   columns, then j, i+j, 2i+j, ... have the same column compositions.
 - Some nodes are two-way; that is, they are inverses of each other. Most nodes
   are one-way as expected of One-Way Woods.
+- analysis.py confirms it: k=7 has only 6813 two-way pairs among 1835008
+  nodes. Every start is solvable for k = 2 to 7, but k=5 and k=7 are not one
+  strongly connected piece (k=5 has a 243-node SCC; k=7 has two 8192-node
+  SCCs and 315 small ones: 312 of 7 nodes and 3 single nodes), so some nodes
+  there can never be returned to once left.
 
 """
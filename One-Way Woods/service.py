@@ -0,0 +1,141 @@
+# RESIDENT SOLVER SERVICE FOR ONE-WAY WOODS
+import numpy as np
+import json
+import os
+import sys
+import time
+import SocketServer
+from master import Master
+from graph import Graph
+from database import Database
+from solver import Solver
+
+class SolverService:
+    # Answers {"k": k, "starts": [...]} queries from per-k state kept warm
+    # across requests: the data_oww_k.db table if built, else an in-memory
+    # backward BFS (up to max_table_k digits), else A* per start
+    def __init__(self, max_table_k=7):
+        self.max_table_k = max_table_k
+        self.warm = {} # k -> (Master, distance array, next-move array), or (Master, None, None)
+
+    def load(self, k):
+        if k not in self.warm:
+            M = Master(k)
+            if os.path.exists("data_oww_"+str(k)+".db"):
+                D = Database(k).open()
+                dist, move = D.table[0], D.table[1]
+            elif k <= self.max_table_k:
+                dist, move, prev = Graph(k, M).bfs_reverse(with_prev=False)
+                dist, move = np.where(dist < 0, Database.none, dist), np.where(move < 0, Database.none, move)
+            else:
+                dist, move = None, None
+            self.warm[k] = (M, dist, move)
+        return self.warm[k]
+
+    def walk(self, M, dist, move, starts):
+        # Follow next-move pointers for the whole batch at once
+        idx = M.rank(starts)
+        paths = [[] for s in starts]
+        prev = np.zeros(len(starts), dtype=np.int64)
+        left = np.flatnonzero(dist[idx] != Database.none)
+        while len(left) > 0:
+            left = left[dist[idx[left]] > 0]
+            if len(left) == 0:
+                break
+            step = move[idx[left]].astype(np.int64)
+            for j, d in zip(left.tolist(), step.tolist()):
+                paths[j].append(Master.moves[d])
+            prev[left] = M.unrank(idx[left])
+            idx[left] = M.successors(idx[left])[step, np.arange(len(left))]
+        start_idx = M.rank(starts)
+        results = []
+        for j in range(len(starts)):
+            if dist[start_idx[j]] == Database.none:
+                results.append({'start': starts[j], 'path': None})
+            else:
+                results.append({'start': starts[j], 'path': ''.join(paths[j]), 'path_len': len(paths[j]), 'node_bef_goal': int(prev[j])})
+        return results
+
+    def answer(self, query):
+        try:
+            k = int(query['k'])
+            starts = [int(n) for n in query['starts']]
+            t0 = time.time()
+            M, dist, move = self.load(k)
+            load = time.time()-t0 # Only non-zero the first time k is asked for
+            t0 = time.time()
+            idx = M.rank(starts)
+            ok = M.valid(idx) & (M.unrank(idx) == np.array(starts, dtype=np.int64))
+            legal = [n for n, o in zip(starts, ok) if o]
+            if dist is not None:
+                solved = self.walk(M, dist, move, legal)
+            else:
+                solved = []
+                for n in legal:
+                    S = Solver(n, k)
+                    S.M = M
+                    S.solve(False, 'astar')
+                    if len(S.data) == 0:
+                        solved.append({'start': n, 'path': None})
+                    else:
+                        row = S.data[-1]
+                        solved.append({'start': n, 'path': row[2], 'path_len': row[3], 'node_bef_goal': row[1]})
+            solved = iter(solved)
+            results = [next(solved) if o else {'start': n, 'error': "not a "+str(k)+"-digit position"} for n, o in zip(starts, ok)]
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': str(e)}
+        latency = time.time()-t0
+        return {'k': k, 'results': results, 'load_s': load, 'latency_s': latency,
+                'throughput_per_s': len(starts)/latency if latency > 0 else None}
+
+def serve_stdio(service):
+    # One JSON query per line on stdin, one JSON answer per line on stdout.
+    # Anything else printed meanwhile (the Solver's "Running...", "No path to
+    # goal from", show_sol) goes to stderr so it can't break the protocol
+    out, sys.stdout = sys.stdout, sys.stderr
+    try:
+        serve_lines(service, out)
+    finally:
+        sys.stdout = out
+
+def serve_lines(service, out):
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        if line.strip():
+            try:
+                reply = service.answer(json.loads(line))
+            except ValueError as e:
+                reply = {'error': str(e)}
+            out.write(json.dumps(reply)+'\n')
+            out.flush()
+
+class QueryHandler(SocketServer.StreamRequestHandler):
+    # Same line protocol as serve_stdio, per socket connection
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                try:
+                    reply = self.server.service.answer(json.loads(line))
+                except ValueError as e:
+                    reply = {'error': str(e)}
+                self.wfile.write(json.dumps(reply)+'\n')
+
+def serve_socket(service, path):
+    if os.path.exists(path):
+        os.remove(path)
+    server = SocketServer.UnixStreamServer(path, QueryHandler)
+    server.service = service
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+if __name__ == '__main__':
+    # Usage: python service.py [socket_path]  (stdin/stdout without a path)
+    if len(sys.argv) > 1:
+        serve_socket(SolverService(), sys.argv[1])
+    else:
+        serve_stdio(SolverService())
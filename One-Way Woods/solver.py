@@ -1,40 +1,341 @@
 # SOLVER FOR ONE-WAY WOODS (GENERAL)
 import numpy as np
+import argparse
+import errno
+import json
+import os
 import time
+import multiprocessing
 from master import Master
-from graph import Graph
+from graph import Graph, Node
+from database import Database
+from cache import SolutionCache
+from writer import RowWriter, ColumnWriter, SummaryWriter
+from heuristic import PatternDatabase
+from landmark import LandmarkIndex
+from stats import Stats, profile
+from analysis import load_unsolvable
 
 class Solver:
+    cache = SolutionCache() # Optimal paths shared by every Solver in this process
+    heuristics = {} # PatternDatabase per k, built on first use
+    landmarks = {} # LandmarkIndex per k, loaded or built on first use
+    unsolvable = {} # Unsolvable starts per k from analysis_oww_k.json (None if not analyzed)
+
     def __init__(self, val, k):
         self.k = k
         self.val = val
+        self.M = None # Master shared by every Graph this Solver builds
+        self.writer = None # Streams rows to disk instead of keeping them in data
+        self.filename = "data_oww_"+str(k)+".csv" # Where exhaust results go
+        self.timed = False # Count and time Master.move_packed per direction in every search
+        self.stats_writer = None # Sidecar for per-solve search stats
+        self.column_writer = None # Typed binary copy of the rows (see columns_dir)
+        self.summary_writer = None # Running aggregates of the rows (see summary_file)
 
         # The data consists of the ff. columns: Node, Node before Goal, Path, Path Length, Solve Time
-        self.data = np.array(['node', 'node_bef_goal', 'path', 'path_len', 'time'])
+        self.header = ['node', 'node_bef_goal', 'path', 'path_len', 'time']
+        self.data = []
+        self.stats_data = [] # Node followed by Stats.row() of each solve
+
+    def solve(self, show_sol, mode='bfs', target=None):
+        # mode is 'bfs' (forward only), 'bidirectional' (meet in the middle)
+        # 'database' (follow the precomputed data_oww_k.db), 'cached'
+        # (BFS that reuses and feeds the shared solution cache), or 'astar'
+        # and 'idastar' (informed search on the pattern database heuristic).
+        # A target other than the goal is always searched by A* on the
+        # landmark index (landmarks_oww_k.npz), whatever the mode
+        t0 = time.time()
+        if self.M is None: # Built once; every later solve and Graph reuses it
+            self.M = Master(self.k)
+        if target is not None and target != self.M.goal:
+            return self.solve_target(show_sol, target)
+        if self.k not in self.unsolvable:
+            self.unsolvable[self.k] = load_unsolvable(self.k)
+        if self.unsolvable[self.k] is not None and self.val in self.unsolvable[self.k]:
+            print "No path to goal from", self.val
+            return
+        self.graph = Graph(self.k, self.M, self.timed)
+        self.graph.init_root(self.val)
+        if mode == 'cached':
+            e = self.cache.get(self.graph.M.pack(self.val))
+            if e is not None:
+                N = Node(self.graph.M.goal, e[0])
+                N.prev = e[1]
+            else:
+                N = self.graph.bfs_cached(self.cache)
+        elif mode in ['astar', 'idastar']:
+            if self.k not in self.heuristics:
+                self.heuristics[self.k] = PatternDatabase(self.graph.M)
+            if mode == 'astar':
+                N = self.graph.astar(self.heuristics[self.k])
+            else:
+                N = self.graph.ida_star(self.heuristics[self.k])
+        elif mode == 'database':
+            N = Database(self.k).lookup(self.val)
+        elif mode == 'bidirectional':
+            N = self.graph.bfs_bidirectional()
+        else:
+            N = self.graph.bfs_driver() # N is for CSV recording purposes...
+        if N is None: # Searched everything reachable without meeting the goal
+            print "No path to goal from", self.val
+            return
+        if mode == 'cached':
+            # Only the solution path is filled: the forward BFS tree gives
+            # shortest distances from the root, not to the goal
+            self.cache.fill(self.graph.M, self.val, N.path)
+        self.record([self.val, N.prev, N.path, len(N.path), time.time()-t0], [self.val]+self.graph.stats.row())
+
+        if show_sol:
+            print "\n***********************"
+            print self.val, N.path, N.val, "\n***********************"
+            for f in Stats.fields:
+                print f+":", getattr(self.graph.stats, f)
 
-    def solve(self, show_sol):
+    def solve_target(self, show_sol, target):
+        # Shortest path from val to an arbitrary target position
         t0 = time.time()
-        self.graph = Graph(self.k)
+        self.graph = Graph(self.k, self.M, self.timed)
         self.graph.init_root(self.val)
-        N = self.graph.bfs_driver() # N is for CSV recording purposes...
-        self.data = np.append(self.data, [self.val, N.prev, N.path, len(N.path), time.time()-t0])
+        if self.k not in self.landmarks:
+            self.landmarks[self.k] = LandmarkIndex(self.graph.M).open()
+        N = self.graph.astar(self.landmarks[self.k].heuristic(target), target)
+        if N is None:
+            print "No path from", self.val, "to", target
+            return
+        self.record([self.val, N.prev, N.path, len(N.path), time.time()-t0], [self.val]+self.graph.stats.row())
 
         if show_sol:
             print "\n***********************"
             print self.val, N.path, N.val, "\n***********************"
+            for f in Stats.fields:
+                print f+":", getattr(self.graph.stats, f)
+
+    def record(self, row, stats):
+        if self.writer is not None:
+            self.writer.write(row)
+            if self.column_writer is not None:
+                self.column_writer.write(row)
+            if self.summary_writer is not None:
+                self.summary_writer.write(row)
+            if self.stats_writer is not None:
+                self.stats_writer.write(stats)
+        else:
+            self.data.append(row)
+            self.stats_data.append(stats)
+
+    def sidecar(self):
+        # data_oww_k.csv -> data_oww_k_stats.csv
+        return self.filename[:-len(".csv")]+"_stats.csv"
+
+    def columns_dir(self):
+        # data_oww_k.csv -> data_oww_k_columns/ (one .npy per column)
+        return self.filename[:-len(".csv")]+"_columns"
+
+    def summary_file(self):
+        # data_oww_k.csv -> data_oww_k_summary.json
+        return self.filename[:-len(".csv")]+"_summary.json"
+
+    def open_writers(self, flush_every, columnar, stats=False, state=None):
+        # state is a checkpoint to resume the outputs from; None starts them afresh
+        state = {} if state is None else state
+        self.writer = RowWriter(self.filename, self.header, flush_every, state.get('csv'))
+        self.summary_writer = SummaryWriter(self.summary_file(), state.get('summary'))
+        if columnar:
+            self.column_writer = ColumnWriter(self.columns_dir(), flush_every, state.get('columns'))
+        if stats:
+            self.stats_writer = RowWriter(self.sidecar(), ['node']+Stats(self.timed).columns(), flush_every, state.get('stats'))
+
+    def close_writers(self):
+        for w in ['writer', 'column_writer', 'summary_writer', 'stats_writer']:
+            if getattr(self, w) is not None:
+                getattr(self, w).close()
+                setattr(self, w, None)
+
+    def checkpoint_file(self): # data_oww_k.csv -> data_oww_k.csv.ckpt
+        return self.filename+".ckpt"
 
-    def exhaust_nodes(self):
+    def lock(self):
+        # One exhaust per output file: data_oww_k.csv.lock holds the owner's pid.
+        # The pid is written to a private file first and hard-linked into place,
+        # so nobody ever reads a half-written lock. A lock is only taken over
+        # when its owner no longer exists (ESRCH)
+        name = self.filename+".lock"
+        tmp = name+"."+str(os.getpid())
+        f = open(tmp, 'w')
+        f.write(str(os.getpid()))
+        f.close()
+        try:
+            while True:
+                try:
+                    os.link(tmp, name)
+                    return
+                except OSError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+                pid = self.lock_owner(name)
+                if pid is None: # Released meanwhile
+                    continue
+                try:
+                    os.kill(pid, 0)
+                except OSError as e:
+                    if e.errno != errno.ESRCH: # EPERM: alive, run by another user
+                        raise RuntimeError(self.filename+" is being written by process "+str(pid))
+                    self.break_lock(name, pid)
+                    continue
+                raise RuntimeError(self.filename+" is being written by process "+str(pid))
+        finally:
+            os.remove(tmp)
+
+    def lock_owner(self, name):
+        # pid in the lock file; None if the file is gone
+        try:
+            text = open(name).read().strip()
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        if not text.isdigit() or int(text) <= 0:
+            raise RuntimeError(name+" holds no pid; remove it if no exhaust is running")
+        return int(text)
+
+    def break_lock(self, name, pid):
+        # Move the dead owner's lock aside. Only one contender's rename finds
+        # it; if what moved is not pid's lock, a newer owner got in first and
+        # its lock goes back
+        stale = name+".stale."+str(os.getpid())
+        try:
+            os.rename(name, stale)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return
+            raise
+        if self.lock_owner(stale) != pid:
+            os.rename(stale, name)
+        else:
+            os.remove(stale)
+
+    def unlock(self):
+        os.remove(self.filename+".lock")
+
+    def checkpoint(self, state):
+        # Sync every output and atomically replace the checkpoint; state carries
+        # the run's settings and 'done', the start nodes finished so far
+        state['csv'] = self.writer.sync()
+        state['summary'] = self.summary_writer.sync()
+        if self.column_writer is not None:
+            state['columns'] = self.column_writer.sync()
+        if self.stats_writer is not None:
+            state['stats'] = self.stats_writer.sync()
+        tmp = self.checkpoint_file()+"."+str(os.getpid())
+        f = open(tmp, 'w')
+        json.dump(state, f, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.rename(tmp, self.checkpoint_file())
+
+    def profile(self, fn, *args):
+        # Opt-in: run solve or an exhaust (by name) under cProfile; the raw
+        # profile goes next to the CSV as data_oww_k.prof
+        return profile(getattr(self, fn), *args, filename=self.filename[:-len(".csv")]+".prof")
+
+    def exhaust_nodes(self, workers=1, shards=None, mode='bfs', flush_every=1000, stats=True, columnar=True,
+                      checkpoint_every=60.0, resume=False, timed=False):
+        # workers > 1 splits the start nodes into shards solved on a process pool;
+        # mode is passed on to solve; rows reach the CSV every flush_every rows;
+        # stats writes each solve's search counters to data_oww_k_stats.csv;
+        # timed adds per-direction move counts and times to them (opt-in: the
+        # clock reads slow every move and inflate the time column);
+        # columnar also writes the rows as typed columns to data_oww_k_columns/;
+        # aggregates of the rows always go to data_oww_k_summary.json.
+        # Every checkpoint_every seconds the outputs are synced and the position
+        # saved to data_oww_k.csv.ckpt; resume=True carries on from there, with
+        # the settings of the interrupted run
         print "Running..."
         t0 = time.time()
-        self.val = 10**(self.k-1)
-        for i in range(self.k*((self.k+1)**(self.k-1))):
-            self.solve(False)
-            self.val = self.base_add(self.val)
+        self.lock()
+        try:
+            if resume:
+                if not os.path.exists(self.checkpoint_file()):
+                    raise ValueError("no checkpoint to resume "+self.filename+" from")
+                state = json.load(open(self.checkpoint_file()))
+                mode, stats, columnar = state['mode'], state['stats'], state['columnar']
+                timed = state.get('timed', stats) # Older checkpoints timed whenever stats was on
+                print "Resuming after", state['done'], "start nodes"
+            else:
+                state = {'k': self.k, 'mode': mode, 'stats': stats, 'columnar': columnar, 'timed': timed, 'done': 0}
+            self.timed = timed
+            self.open_writers(flush_every, columnar, stats, state if resume else None)
+            if not resume:
+                self.checkpoint(state)
+            last = time.time()
+            if self.M is None:
+                self.M = Master(self.k)
+            M = self.M # Shared by every solve below
+            total = self.k*((self.k+1)**(self.k-1))
+            first = int(M.base[0])+state['done'] # Dense index of the next start node
+            if workers > 1:
+                shards = workers*8 if shards is None else shards
+                size = -(-total//shards)
+                jobs = [(self.k, int(M.unrank([first+i])[0]), min(size, total-state['done']-i), mode, self.timed)
+                        for i in range(0, total-state['done'], size)]
+                pool = multiprocessing.Pool(workers, init_worker, (self.k,))
+                for j, (rows, stats_rows) in enumerate(pool.imap(solve_shard, jobs)): # Streams back in node order
+                    for row, stats_row in zip(rows, stats_rows):
+                        self.record(row, stats_row)
+                    state['done'] += jobs[j][2]
+                    if time.time()-last >= checkpoint_every:
+                        self.checkpoint(state)
+                        last = time.time()
+                    print "Shard", j+1, "of", len(jobs), "done:", time.time()-t0, "s"
+                pool.close()
+                pool.join()
+            else:
+                self.val = int(M.unrank([first])[0])
+                while state['done'] < total:
+                    self.solve(False, mode)
+                    self.val = self.base_add(self.val)
+                    state['done'] += 1
+                    if time.time()-last >= checkpoint_every:
+                        self.checkpoint(state)
+                        last = time.time()
+                if mode == 'cached':
+                    print "Cache hits:", self.cache.hits, "misses:", self.cache.misses
 
-        self.data = np.reshape(self.data, [len(self.data)/5, 5])
-        np.savetxt("data_oww_"+str(self.k)+".csv", self.data, delimiter=',', fmt='%s')
+            self.close_writers()
+            if os.path.exists(self.checkpoint_file()):
+                os.remove(self.checkpoint_file())
+        finally: # The checkpoint outlives a crash; the lock does not
+            self.unlock()
         print "Done! Time taken to exhaust:", time.time()-t0, "s"     
 
+    def exhaust_reverse(self, flush_every=1000, columnar=True):
+        # Same output as exhaust_nodes, from a single BFS outward from the goal
+        print "Running..."
+        t0 = time.time()
+        self.lock()
+        try:
+            self.graph = Graph(self.k)
+            dist, move, prev = self.graph.bfs_reverse()
+            path = self.graph.reverse_paths(move)
+
+            # Dense order over legal positions matches the base_add enumeration
+            nodes = np.flatnonzero(self.graph.M.valid(np.arange(self.graph.M.size)))
+            vals = self.graph.M.unrank(nodes)
+            t = (time.time()-t0)/len(nodes) # Solve time is shared evenly by all nodes
+
+            self.open_writers(flush_every, columnar)
+            for i, n in zip(nodes.tolist(), vals.tolist()):
+                if dist[i] < 0:
+                    print "No path to goal from", n
+                    continue
+                self.record([n, prev[i], path[i], len(path[i]), t], None)
+            self.close_writers()
+        finally:
+            self.unlock()
+        print "Done! Time taken to exhaust:", time.time()-t0, "s"
+
     def base_add(self, n):
         # Perform a base-(k+1) increment, provided k < 9
         n += 1
@@ -44,5 +345,39 @@ class Solver:
                 n = n[:i-1]+str(int(n[i-1])+1)+'0'+n[i+1:]
         return int(n)
 
+worker_master = None # Warm Master of a pool worker
+
+def init_worker(k):
+    global worker_master
+    worker_master = Master(k)
+
+def solve_shard(job):
+    # Solve count consecutive start nodes from val; returns their rows and stats rows
+    k, val, count, mode, timed = job
+    S = Solver(val, k)
+    S.M = worker_master
+    S.timed = timed
+    for i in range(count):
+        S.solve(False, mode)
+        S.val = S.base_add(S.val)
+    return S.data, S.stats_data
+
 #S = Solver(11111, 5)
 #S.exhaust_nodes()
+
+if __name__ == '__main__':
+    # Usage: python solver.py k [--workers N] [--mode bfs] [--checkpoint-every S] [--resume] [--timed]
+    parser = argparse.ArgumentParser(description="Exhaust every One-Way Woods start node")
+    parser.add_argument('k', type=int)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--mode', default='bfs')
+    parser.add_argument('--checkpoint-every', type=float, default=60.0, help="seconds between checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from data_oww_k.csv.ckpt")
+    parser.add_argument('--timed', action='store_true', help="time every move per direction in the stats sidecar")
+    parser.add_argument('--out', default=None, help="CSV to write (default data_oww_k.csv)")
+    args = parser.parse_args()
+    S = Solver(0, args.k)
+    if args.out is not None:
+        S.filename = args.out
+    S.exhaust_nodes(args.workers, mode=args.mode, checkpoint_every=args.checkpoint_every, resume=args.resume,
+                    timed=args.timed)
@@ -0,0 +1,63 @@
+# SEARCH INSTRUMENTATION FOR ONE-WAY WOODS SOLVER
+import cProfile
+import pstats
+import time
+from master import Master
+
+class Stats:
+    # Per-solve search counters; Graph's searches fill these in as they run
+    directions = Master.moves
+    fields = ['expanded', 'expanded_bwd', 'generated', 'duplicates', 'max_frontier', 'depth']
+
+    def __init__(self, timed=False):
+        self.timed = timed # Whether moves and move_time are filled in (TimedMaster)
+        self.expanded = 0 # Nodes expanded (forward, or the only side)
+        self.expanded_bwd = 0 # Nodes expanded by a backward search
+        self.generated = 0 # Successors (or predecessors) produced
+        self.duplicates = 0 # Generated values that were already known
+        self.max_frontier = 0 # Largest open list seen
+        self.depth = 0 # Deepest level generated (summed over both sides)
+        self.moves = dict((d, 0) for d in self.directions) # Master.move_packed calls
+        self.move_time = dict((d, 0.0) for d in self.directions) # Time inside them
+
+    def frontier(self, size):
+        if size > self.max_frontier:
+            self.max_frontier = size
+
+    def columns(self): # The per-direction columns only come with timing on
+        if not self.timed:
+            return list(self.fields)
+        return self.fields+['moves_'+d for d in self.directions]+['move_time_'+d for d in self.directions]
+
+    def row(self):
+        if not self.timed:
+            return [getattr(self, f) for f in self.fields]
+        return [getattr(self, f) for f in self.fields]+[self.moves[d] for d in self.directions]+[self.move_time[d] for d in self.directions]
+
+class TimedMaster(object):
+    # Stands in for a Master, counting and timing move_packed calls per direction.
+    # Two clock reads per move: opt-in only, as it slows searches noticeably
+    def __init__(self, M, stats):
+        self.M = M
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.M, name)
+
+    def move_packed(self, d, p):
+        t0 = time.time()
+        p = self.M.move_packed(d, p)
+        self.stats.move_time[d] += time.time()-t0
+        self.stats.moves[d] += 1
+        return p
+
+def profile(fn, *args, **kwargs):
+    # Run fn under cProfile, print the top entries and optionally keep the raw
+    # profile (filename= keyword); returns fn's result
+    filename = kwargs.pop('filename', None)
+    P = cProfile.Profile()
+    result = P.runcall(fn, *args, **kwargs)
+    if filename is not None:
+        P.dump_stats(filename)
+    pstats.Stats(P).sort_stats('cumulative').print_stats(20)
+    return result
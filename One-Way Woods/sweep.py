@@ -0,0 +1,106 @@
+# RULE-MATRIX SWEEP FOR ONE-WAY WOODS
+import argparse
+import itertools
+import json
+import multiprocessing
+import random
+import time
+import numpy as np
+from master import Master
+from graph import Graph
+
+def default_rules(k):
+    return [''.join(r) for r in Master(k).rules]
+
+def rules0(k):
+    M = Master(k)
+    M.rules[:] = ''
+    M.build_rules0()
+    return [''.join(r) for r in M.rules]
+
+def column_rules(k, sample=None, seed=None):
+    # Every rule matrix whose columns are independent permutations of U, R, D, L
+    # (24**k of them), or sample of them drawn with the given seed
+    perms = [''.join(p) for p in itertools.permutations('URDL')]
+    if sample is None:
+        columns = itertools.product(perms, repeat=k)
+    else:
+        rng = random.Random(seed)
+        columns = ([rng.choice(perms) for i in range(k)] for j in range(sample))
+    for cols in columns:
+        yield [''.join(c[row] for c in cols) for row in range(4)]
+
+def family(k, name, sample=None, seed=None):
+    # Yields (name, rules) for every ruleset in the named family
+    if name == 'default':
+        rulesets = [default_rules(k)]
+    elif name == 'rules0':
+        rulesets = [rules0(k)]
+    elif name == 'columns':
+        rulesets = column_rules(k, sample, seed)
+    else:
+        raise ValueError("unknown rule family "+name)
+    for rules in rulesets:
+        yield name, rules
+
+def evaluate(job):
+    # Full-graph summary of one rule matrix from a single backward BFS
+    k, name, rules = job
+    M = Master(k, rules)
+    dist, move, prev = Graph(k, M).bfs_reverse()
+    nodes = np.flatnonzero(M.valid(np.arange(M.size)))
+    d = dist[nodes]
+    ok = d >= 0
+    goal = M.rank([M.goal])[0]
+    pre, count = np.unique(prev[nodes[ok & (nodes != goal)]], return_counts=True)
+    return {
+        'k': k,
+        'family': name,
+        'rules': rules,
+        'solvable': float(ok.mean()),
+        'mean_len': float(d[ok].mean()),
+        'max_len': int(d[ok].max()),
+        'pre_goal': dict((str(n), int(c)) for n, c in zip(pre.tolist(), count.tolist())),
+    }
+
+def sweep(k, rulesets, workers=None, chunksize=16):
+    # rulesets yields (family name, rules); yields evaluate() results in input
+    # order, the evaluations spread over a process pool
+    pool = multiprocessing.Pool(workers)
+    try:
+        for r in pool.imap(evaluate, ((k, name, rules) for name, rules in rulesets), chunksize):
+            yield r
+    finally:
+        pool.close()
+        pool.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate One-Way Woods rule matrices")
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--family', nargs='+', default=['default', 'rules0', 'columns'])
+    parser.add_argument('--sample', type=int, default=None, help="random column rulesets instead of all 24**k")
+    parser.add_argument('--seed', type=int, default=2017)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=10, help="best rulesets to print")
+    parser.add_argument('--out', default=None, help="JSON lines file (default sweep_oww_k.jsonl)")
+    args = parser.parse_args()
+
+    out = "sweep_oww_"+str(args.k)+".jsonl" if args.out is None else args.out
+    rulesets = itertools.chain(*[family(args.k, name, args.sample, args.seed) for name in args.family])
+    t0 = time.time()
+    f = open(out, 'w')
+    results = [] # Without the pre-goal counts, to keep memory flat
+    for r in sweep(args.k, rulesets, args.workers):
+        f.write(json.dumps(r, sort_keys=True)+'\n')
+        results.append((r['solvable'], r['mean_len'], r['max_len'], len(r['pre_goal']), '/'.join(r['rules']), r['family']))
+    f.close()
+    print "Evaluated", len(results), "rulesets in", time.time()-t0, "s ->", out
+
+    # The named layouts first, then the best of the lot: most solvable, then shortest
+    print "%-8s %-8s %-4s %-6s %-10s %s" % ("solvable", "mean_len", "max", "pre", "family", "rules (rows: ops 1-4)")
+    named = [r for r in results if r[5] != 'columns']
+    for r in named+sorted(results, key=lambda r: (-r[0], r[1]))[:args.top]:
+        print "%-8.4f %-8.3f %-4d %-6d %-10s %s" % r
+
+if __name__ == '__main__':
+    main()
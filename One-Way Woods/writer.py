@@ -0,0 +1,194 @@
+# STREAMING ROW WRITER FOR ONE-WAY WOODS RESULTS
+import numpy as np
+import csv
+import json
+import os
+import sys
+from master import Master
+
+class RowWriter:
+    # Buffers CSV rows and flushes them every flush_every rows, so a run
+    # killed at any point keeps everything up to its last flush on disk.
+    # Given a (byte offset, rows) position from sync(), it reopens the file
+    # there instead, dropping whatever was written after it
+    def __init__(self, filename, header, flush_every=1000, position=None):
+        self.filename = filename
+        self.flush_every = flush_every
+        self.buffer = []
+        if position is None:
+            self.rows = 0 # Rows written so far, header excluded
+            self.f = open(filename, 'w')
+            self.f.write(','.join(header)+'\n')
+            self.f.flush()
+        else:
+            offset, self.rows = position
+            self.f = open(filename, 'r+')
+            self.f.truncate(offset)
+            self.f.seek(offset)
+
+    def write(self, row):
+        self.buffer.append(','.join([str(x) for x in row])+'\n')
+        self.rows += 1
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self.f.write(''.join(self.buffer))
+        self.f.flush()
+        self.buffer = []
+
+    def sync(self):
+        # Flush to stable storage; returns the position to resume from
+        self.flush()
+        os.fsync(self.f.fileno())
+        return [self.f.tell(), self.rows]
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+class ColumnWriter:
+    # Binary twin of RowWriter for exhaust rows: one typed .npy file per column
+    # in a directory, so readers can memory-map just the columns they need.
+    # Paths are packed as base-5 move codes (first move most significant)
+    # next to their length. Columns stream to raw .part files until close();
+    # given the row count from sync(), it picks those back up instead
+    directions = Master.moves
+    columns = [('node', np.int64), ('node_bef_goal', np.int64), ('path', np.uint64), ('path_len', np.uint8), ('time', np.float32)]
+    max_path = 27 # Longest path whose code fits in a uint64
+
+    def __init__(self, dirname, flush_every=1000, position=None):
+        self.dirname = dirname
+        self.flush_every = flush_every
+        self.buffer = []
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        if position is None:
+            self.rows = 0
+            self.parts = [open(os.path.join(dirname, name+".part"), 'wb') for name, dtype in self.columns]
+        else:
+            self.rows = position
+            self.parts = [open(os.path.join(dirname, name+".part"), 'r+b') for name, dtype in self.columns]
+            for f, (name, dtype) in zip(self.parts, self.columns):
+                f.truncate(self.rows*np.dtype(dtype).itemsize)
+                f.seek(0, 2)
+
+    def write(self, row):
+        node, prev, path, length, t = row
+        if length > self.max_path:
+            raise ValueError("path of "+str(length)+" moves does not fit a uint64 code")
+        code = 0
+        for d in path:
+            code = 5*code+self.directions.index(d)
+        self.buffer.append((node, prev, code, length, t))
+        self.rows += 1
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            for f, (name, dtype), values in zip(self.parts, self.columns, zip(*self.buffer)):
+                f.write(np.array(values, dtype=dtype).tostring())
+                f.flush()
+        self.buffer = []
+
+    def sync(self):
+        self.flush()
+        for f in self.parts:
+            os.fsync(f.fileno())
+        return self.rows
+
+    def close(self):
+        self.flush()
+        for f, (name, dtype) in zip(self.parts, self.columns):
+            f.close()
+            part = os.path.join(self.dirname, name+".part")
+            out = np.lib.format.open_memmap(os.path.join(self.dirname, name+".npy"), mode='w+', dtype=dtype, shape=(self.rows,))
+            if self.rows > 0:
+                out[:] = np.memmap(part, dtype=dtype, mode='r', shape=(self.rows,))
+            out.flush()
+            del out
+            os.remove(part)
+
+class SummaryWriter:
+    # Running aggregates of exhaust rows, in memory proportional to the number
+    # of distinct pre-goal nodes and path lengths; close() writes them as JSON.
+    # Given the state from sync(), it carries on from there
+    directions = Master.moves
+
+    def __init__(self, filename, position=None):
+        self.filename = filename
+        if position is None:
+            self.rows = 0
+            self.path_len_sum = 0
+            self.time_sum = 0.0
+            self.node_bef_goal = {} # Pre-goal node -> count
+            self.path_len = {} # Path length -> count
+            self.moves = dict((d, 0) for d in self.directions) # Moves on optimal paths
+        else:
+            for key, value in position.items():
+                setattr(self, key, value)
+            self.node_bef_goal = dict((int(n), c) for n, c in self.node_bef_goal.items())
+            self.path_len = dict((int(n), c) for n, c in self.path_len.items())
+
+    def write(self, row):
+        node, prev, path, length, t = row
+        self.rows += 1
+        self.path_len_sum += length
+        self.time_sum += t
+        self.node_bef_goal[prev] = self.node_bef_goal.get(prev, 0)+1
+        self.path_len[length] = self.path_len.get(length, 0)+1
+        for d in path:
+            self.moves[d] += 1
+
+    def sync(self):
+        return {'rows': self.rows, 'path_len_sum': self.path_len_sum, 'time_sum': self.time_sum,
+                'node_bef_goal': self.node_bef_goal, 'path_len': self.path_len, 'moves': self.moves}
+
+    def close(self):
+        summary = self.sync()
+        summary['path_len_mean'] = float(self.path_len_sum)/self.rows if self.rows > 0 else None
+        json.dump(summary, open(self.filename, 'w'), indent=1, separators=(',', ': '), sort_keys=True)
+
+def read_summary(filename):
+    # SummaryWriter's JSON with the count keys turned back into ints
+    summary = json.load(open(filename))
+    for key in ['node_bef_goal', 'path_len']:
+        summary[key] = dict((int(n), c) for n, c in summary[key].items())
+    return summary
+
+def read_columns(dirname, names=None):
+    # Memory-mapped columns written by ColumnWriter, as a dict name -> array
+    if names is None:
+        names = [name for name, dtype in ColumnWriter.columns]
+    return dict((name, np.load(os.path.join(dirname, name+".npy"), mmap_mode='r')) for name in names)
+
+def decode_paths(code, length):
+    # Inverse of ColumnWriter's path packing; returns a list of path strings
+    paths = []
+    for c, n in zip(np.asarray(code).tolist(), np.asarray(length).tolist()):
+        path = []
+        for i in range(n):
+            path.append(ColumnWriter.directions[c%5])
+            c //= 5
+        paths.append(''.join(reversed(path)))
+    return paths
+
+def from_csv(filename, flush_every=100000):
+    # Derives data_oww_k_columns/ and data_oww_k_summary.json from an existing
+    # data_oww_k.csv without loading it whole
+    base = filename[:-len(".csv")]
+    writers = [ColumnWriter(base+"_columns", flush_every), SummaryWriter(base+"_summary.json")]
+    reader = csv.reader(open(filename))
+    next(reader)
+    for node, prev, path, length, t in reader:
+        for W in writers:
+            W.write([int(node), int(prev), path, int(length), float(t)])
+    for W in writers:
+        W.close()
+    return [base+"_columns", base+"_summary.json"]
+
+if __name__ == '__main__':
+    # Usage: python writer.py data_oww_k.csv [...]
+    for filename in sys.argv[1:]:
+        print "Wrote", ', '.join(from_csv(filename))